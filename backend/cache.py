@@ -0,0 +1,65 @@
+"""
+In-process TTL/LRU cache for StudyForge Backend
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from metrics import metrics
+
+
+class TTLCache:
+    """
+    Bounded mapping whose entries expire after a time-to-live.
+
+    The least recently used entry is evicted when max_size is reached.
+    Hits, misses and evictions are counted in metrics as
+    <name>_cache_hits, <name>_cache_misses and <name>_cache_evictions.
+    """
+
+    def __init__(self, name: str, max_size: int, ttl: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a live entry, or None"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > now:
+                    self._items.move_to_end(key)
+                    metrics.inc(f"{self.name}_cache_hits")
+                    return value
+                del self._items[key]
+        metrics.inc(f"{self.name}_cache_misses")
+        return None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store an entry; ttl overrides the cache's default for this entry"""
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        with self._lock:
+            self._items[key] = (expires_at, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                metrics.inc(f"{self.name}_cache_evictions")
+
+    def invalidate(self, key: Hashable):
+        """Drop an entry if present"""
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
@@ -4,12 +4,17 @@ StudyForge Backend - FastAPI Application
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import os
 
 from routers import auth, exams, progress, video
 from config import settings
+from metrics import metrics, monitor_event_loop
+from models.database import DatabaseUnavailable, db
+from services.video_jobs import job_store
+from services.video_worker import claim_worker_pool, start_worker_processes, stop_worker_processes
 
 
 @asynccontextmanager
@@ -18,17 +23,57 @@ async def lifespan(app: FastAPI):
     # Startup
     print("Starting StudyForge Backend...")
 
-    # Initialize Playwright browser lazily for video generation
-    from services.slide_renderer import SlideRenderer
-    app.state.renderer = SlideRenderer()
-    # Browser will be initialized on first use
+    # Track event loop lag (blocking work in handlers shows up here)
+    loop_monitor = asyncio.create_task(monitor_event_loop())
+
+    # Connect the storage backend
+    if db.connect():
+        await db.startup()
+    if db.wrong_answer_buffer is not None:
+        db.wrong_answer_buffer.start()
+
+    # Index exam files once; request handlers read from the catalog
+    from services.exam_catalog import catalog
+    count = catalog.build()
+    build_seconds = metrics.gauges["exam_catalog_build_seconds"]
+    print(f"Indexed {count} exams from {catalog.bundle_path if catalog.bundle else catalog.data_dir} "
+          f"in {build_seconds:.2f}s")
+
+    # A bundle-backed catalog builds its search index in the background
+    search_warmup = None
+    if catalog.bundle:
+        search_warmup = asyncio.create_task(asyncio.to_thread(catalog.build_search_shards))
+
+    # Pick up added, changed or deleted exam files without a restart
+    catalog_watcher = None
+    if settings.EXAM_CATALOG_POLL_SECONDS > 0:
+        catalog_watcher = asyncio.create_task(catalog.watch(settings.EXAM_CATALOG_POLL_SECONDS))
+
+    # Video jobs run in worker processes, not in the API event loop.
+    # One API process per host starts them; the others share its pool.
+    video_workers = []
+    if settings.VIDEO_WORKERS > 0:
+        if claim_worker_pool():
+            video_workers = start_worker_processes(settings.VIDEO_WORKERS)
+            print(f"Started {len(video_workers)} video worker processes")
+        else:
+            print("Video workers are run by another API process")
 
     yield
 
     # Shutdown
     print("Shutting down...")
-    if app.state.renderer.browser:
-        await app.state.renderer.close_browser()
+    loop_monitor.cancel()
+    if catalog_watcher:
+        catalog_watcher.cancel()
+    if search_warmup:
+        search_warmup.cancel()
+    catalog.close()
+    if db.wrong_answer_buffer is not None:
+        await db.wrong_answer_buffer.close()
+    await db.shutdown()
+    await job_store.close()
+    await asyncio.to_thread(stop_worker_processes, video_workers)
 
 
 app = FastAPI(
@@ -45,8 +90,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+@app.exception_handler(DatabaseUnavailable)
+async def database_unavailable_handler(request, exc: DatabaseUnavailable):
+    """Answer 503 when a database call times out or fails transiently"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
 # API routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(exams.router, prefix="/api/exams", tags=["Exams"])
@@ -60,6 +112,12 @@ async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """In-process counters, gauges and latency histograms of this worker"""
+    return metrics.snapshot()
+
+
 # Serve static frontend files (production)
 static_path = os.path.join(os.path.dirname(__file__), "static")
 if os.path.exists(static_path):
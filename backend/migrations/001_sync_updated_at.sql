@@ -0,0 +1,22 @@
+-- Server-side change time of progress rows, used by GET /api/progress/sync
+-- to return only rows changed since the client's last sync.
+--
+-- Supabase only: the SQL backend (DATABASE_URL) creates its tables itself.
+-- Run once in the Supabase SQL editor; safe to run again.
+
+ALTER TABLE quiz_sessions ADD COLUMN IF NOT EXISTS updated_at timestamptz;
+ALTER TABLE wrong_answers ADD COLUMN IF NOT EXISTS updated_at timestamptz;
+
+-- Existing rows count as changed now, so every client's next delta sync
+-- picks them up once.
+UPDATE quiz_sessions SET updated_at = now() WHERE updated_at IS NULL;
+UPDATE wrong_answers SET updated_at = now() WHERE updated_at IS NULL;
+
+ALTER TABLE quiz_sessions ALTER COLUMN updated_at SET DEFAULT now();
+ALTER TABLE quiz_sessions ALTER COLUMN updated_at SET NOT NULL;
+ALTER TABLE wrong_answers ALTER COLUMN updated_at SET DEFAULT now();
+ALTER TABLE wrong_answers ALTER COLUMN updated_at SET NOT NULL;
+
+-- Keyset pagination on (updated_at, id) per user
+CREATE INDEX IF NOT EXISTS ix_quiz_sessions_user_updated ON quiz_sessions (user_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS ix_wrong_answers_user_updated ON wrong_answers (user_id, updated_at, id);
@@ -0,0 +1,58 @@
+-- Per-user progress counters, one row per (user_id, exam_id) plus the
+-- overall row under exam_id ''. The backend keeps them up to date on
+-- every write; GET /api/progress/stats reads a single row.
+--
+-- Supabase only: the SQL backend (DATABASE_URL) creates its tables itself.
+-- Run once in the Supabase SQL editor; safe to run again. To recompute
+-- the counters later, run backend/scripts/rebuild_user_stats.py.
+
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id text NOT NULL,
+    exam_id text NOT NULL,
+    total_sessions integer NOT NULL DEFAULT 0,
+    completed_sessions integer NOT NULL DEFAULT 0,
+    total_questions integer NOT NULL DEFAULT 0,
+    total_score double precision NOT NULL DEFAULT 0,
+    unmastered_wrong integer NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, exam_id)
+);
+
+-- Backfill from existing rows, with the same rules as models/user_stats.py:
+-- questions and score count for completed sessions only.
+INSERT INTO user_stats (
+    user_id, exam_id, total_sessions, completed_sessions,
+    total_questions, total_score, unmastered_wrong
+)
+SELECT
+    user_id,
+    CASE WHEN GROUPING(exam_id) = 1 THEN '' ELSE exam_id END,
+    sum(total_sessions),
+    sum(completed_sessions),
+    sum(total_questions),
+    sum(total_score),
+    sum(unmastered_wrong)
+FROM (
+    SELECT
+        user_id::text AS user_id,
+        exam_id,
+        1 AS total_sessions,
+        CASE WHEN completed THEN 1 ELSE 0 END AS completed_sessions,
+        CASE WHEN completed THEN coalesce(json_array_length(questions::json), 0) ELSE 0 END AS total_questions,
+        CASE WHEN completed THEN coalesce(score, 0) ELSE 0 END AS total_score,
+        0 AS unmastered_wrong
+    FROM quiz_sessions
+    UNION ALL
+    SELECT
+        user_id::text, exam_id, 0, 0, 0, 0,
+        CASE WHEN mastered THEN 0 ELSE 1 END
+    FROM wrong_answers
+) AS contributions
+GROUP BY GROUPING SETS ((user_id, exam_id), (user_id))
+-- Rows without an exam only count towards the overall row
+HAVING GROUPING(exam_id) = 1 OR coalesce(exam_id, '') <> ''
+ON CONFLICT (user_id, exam_id) DO UPDATE SET
+    total_sessions = excluded.total_sessions,
+    completed_sessions = excluded.completed_sessions,
+    total_questions = excluded.total_questions,
+    total_score = excluded.total_score,
+    unmastered_wrong = excluded.unmastered_wrong;
@@ -0,0 +1,12 @@
+-- Hash of each progress row as the client last uploaded it through
+-- POST /api/progress/sync. POST /api/progress/sync/manifest compares it
+-- with the client's hashes to skip records the server already has.
+-- Other writes set it to NULL, so those rows are always uploaded again.
+--
+-- Supabase only: the SQL backend (DATABASE_URL) creates its tables itself.
+-- Run once in the Supabase SQL editor; safe to run again.
+
+-- Existing rows start without a hash: the first manifest asks for them
+-- once and the following sync stores their hashes.
+ALTER TABLE quiz_sessions ADD COLUMN IF NOT EXISTS content_hash text;
+ALTER TABLE wrong_answers ADD COLUMN IF NOT EXISTS content_hash text;
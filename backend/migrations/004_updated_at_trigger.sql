@@ -0,0 +1,28 @@
+-- Stamp updated_at with the database clock on every insert and update of
+-- a progress row. GET /api/progress/sync compares it with the client's
+-- last sync time, so all writers must use one clock; the API no longer
+-- sends updated_at itself.
+--
+-- now() is the transaction start, which can precede the commit by a few
+-- moments. GET /api/progress/sync re-reads SYNC_SINCE_OVERLAP_SECONDS
+-- before since to cover that window.
+--
+-- Supabase only: the SQL backend (DATABASE_URL) stamps the database time
+-- itself. Run once in the Supabase SQL editor; safe to run again.
+
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS quiz_sessions_updated_at ON quiz_sessions;
+CREATE TRIGGER quiz_sessions_updated_at
+    BEFORE INSERT OR UPDATE ON quiz_sessions
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS wrong_answers_updated_at ON wrong_answers;
+CREATE TRIGGER wrong_answers_updated_at
+    BEFORE INSERT OR UPDATE ON wrong_answers
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
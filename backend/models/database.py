@@ -1,19 +1,223 @@
 """
-Database connection and operations using Supabase
+Database connection and operations
+
+Database is the storage interface used by the routers. SupabaseDatabase
+talks to Supabase over HTTP; SQLDatabase (models/sql_database.py) talks
+to PostgreSQL or SQLite directly and is used when DATABASE_URL is set.
 """
 from supabase import create_client, Client
-from typing import Optional, List, Dict, Any
+from postgrest.exceptions import APIError
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
+import asyncio
+import threading
+import time
 import os
+import weakref
+
+import httpx
 
+from cache import TTLCache
+from .write_behind import WrongAnswerBuffer
+from .user_stats import (
+    ALL_EXAMS, STAT_FIELDS, compute_stats, format_stats, stats_deltas,
+    session_contribution, wrong_answer_contribution
+)
 from config import settings
+from metrics import metrics
+
+# Columns read from rows about to be overwritten, to compute stats deltas
+SESSION_STATS_COLUMNS = "id,exam_id,completed,questions,score"
+WRONG_STATS_COLUMNS = "id,exam_id,mastered"
+
+# Ids per content hash lookup; keeps the PostgREST query string short
+HASH_LOOKUP_CHUNK_SIZE = 200
+
+# Users by ID for authenticated requests; backends drop entries they write
+user_cache = TTLCache("user", settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+
+# SQLSTATE classes of errors that may pass on retry: connection lost,
+# serialization failure or deadlock, out of resources, server shutting down
+TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57P")
+
+# PostgREST errors for a database it could not connect to
+TRANSIENT_POSTGREST_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003"}
+
+
+class DatabaseUnavailable(Exception):
+    """A database call failed in a way that may pass when retried unchanged"""
+
+
+class DatabaseTimeout(DatabaseUnavailable):
+    """A database call did not finish within SUPABASE_TIMEOUT_SECONDS"""
 
 
 class Database:
-    """Supabase database wrapper"""
+    """Storage backend interface"""
+
+    # Set by create_database when WRONG_ANSWER_BUFFER_ENABLED
+    wrong_answer_buffer: Optional[WrongAnswerBuffer] = None
+
+    def connect(self) -> bool:
+        """Initialize the backend client; returns whether it is usable"""
+        raise NotImplementedError
+
+    @property
+    def is_connected(self) -> bool:
+        raise NotImplementedError
+
+    async def startup(self):
+        """Prepare the backend (create tables, warm pools) at app startup"""
+
+    async def shutdown(self):
+        """Release connections at app shutdown"""
+
+    # ============ User Operations ============
+
+    async def get_user_by_google_id(self, google_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    async def get_user_by_id(self, user_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    async def create_user(self, user_data: Dict) -> Dict:
+        raise NotImplementedError
+
+    async def update_user(self, user_id: str, user_data: Dict) -> Dict:
+        raise NotImplementedError
+
+    # ============ Quiz Session Operations ============
+
+    async def get_user_sessions(self, user_id: str, exam_id: Optional[str] = None) -> List[Dict]:
+        raise NotImplementedError
+
+    async def save_session(self, user_id: str, session_data: Dict) -> Dict:
+        raise NotImplementedError
+
+    async def save_sessions_batch(self, user_id: str, sessions: List[Dict]) -> List[str]:
+        """Upsert sessions; returns the ids of the rows written"""
+        raise NotImplementedError
+
+    async def get_sessions_changed(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        after: Optional[Tuple[str, str]] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Sessions with updated_at > since, ordered by (updated_at, id).
+        after is the (updated_at, id) of the last row of the previous page.
+        """
+        raise NotImplementedError
+
+    # ============ Wrong Answer Operations ============
+
+    async def get_user_wrong_answers(
+        self,
+        user_id: str,
+        exam_id: Optional[str] = None,
+        mastered: Optional[bool] = None
+    ) -> List[Dict]:
+        raise NotImplementedError
+
+    async def save_wrong_answer(self, user_id: str, wrong_data: Dict) -> Dict:
+        raise NotImplementedError
+
+    async def save_wrong_answers_batch(self, user_id: str, wrong_answers: List[Dict]) -> List[str]:
+        """Upsert wrong answers; returns the ids of the rows written"""
+        raise NotImplementedError
+
+    async def mark_wrong_mastered(self, user_id: str, wrong_id: str) -> bool:
+        raise NotImplementedError
+
+    async def queue_wrong_answer(self, user_id: str, wrong_data: Dict) -> Dict:
+        """Save a wrong answer, through the write-behind buffer when enabled"""
+        if self.wrong_answer_buffer is None or not self.is_connected:
+            # Disconnected: fail now rather than accept a row no flush can write
+            return await self.save_wrong_answer(user_id, wrong_data)
+        return await self.wrong_answer_buffer.add(user_id, wrong_data)
+
+    async def flush_wrong_answers(self, user_id: Optional[str] = None):
+        """Write buffered wrong answers (of one user) before reading or replacing them"""
+        if self.wrong_answer_buffer is not None:
+            await self.wrong_answer_buffer.flush(user_id)
+
+    async def get_wrong_answers_changed(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        after: Optional[Tuple[str, str]] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Wrong answers with updated_at > since, ordered by (updated_at, id)"""
+        raise NotImplementedError
+
+    # ============ Sync Operations ============
 
-    def __init__(self):
+    async def get_content_hashes(self, user_id: str, table: str, ids: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Stored content hashes of a user's rows in quiz_sessions or
+        wrong_answers; ids without a row are left out.
+        """
+        raise NotImplementedError
+
+    # ============ Stats Operations ============
+
+    async def get_user_stats(self, user_id: str, exam_id: Optional[str] = None) -> Dict:
+        """Get user statistics, overall or for one exam"""
+        if not self.is_connected:
+            return format_stats(None)
+        return format_stats(await self.get_stats_record(user_id, exam_id or ALL_EXAMS))
+
+    async def get_stats_record(self, user_id: str, exam_id: str) -> Optional[Dict]:
+        """Get the maintained stats row of a user for an exam (ALL_EXAMS for totals)"""
+        raise NotImplementedError
+
+    async def list_user_ids(self) -> List[str]:
+        raise NotImplementedError
+
+    async def replace_user_stats(self, user_id: str, stats: Dict[str, Dict]):
+        """Replace all stats rows of a user"""
+        raise NotImplementedError
+
+    async def rebuild_user_stats(self, user_id: str) -> Dict[str, Dict]:
+        """Recompute a user's stats rows from their sessions and wrong answers"""
+        sessions, wrong_answers = await asyncio.gather(
+            self.get_user_sessions(user_id),
+            self.get_user_wrong_answers(user_id)
+        )
+        stats = compute_stats(sessions, wrong_answers)
+        await self.replace_user_stats(user_id, stats)
+        return stats
+
+
+class SupabaseDatabase(Database):
+    """
+    Supabase database wrapper.
+
+    The Supabase client is synchronous, so every request is executed on a
+    dedicated, size-limited thread pool (SUPABASE_WORKERS) and awaited with
+    a timeout; the event loop keeps serving other requests meanwhile.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.SUPABASE_WORKERS,
+        timeout: float = settings.SUPABASE_TIMEOUT_SECONDS
+    ):
         self.client: Optional[Client] = None
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="supabase")
+        self._queued = 0
+        self._running = 0
+        self._counts_lock = threading.Lock()
+        # user_id -> lock held while a write updates the user's stats rows
+        self._stats_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        # Users whose last stats update may be missing, see _update_stats
+        self._stale_stats: set = set()
 
     def connect(self):
         """Initialize Supabase client"""
@@ -26,20 +230,136 @@ class Database:
     def is_connected(self) -> bool:
         return self.client is not None
 
+    async def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def _track(self, queued: int = 0, running: int = 0):
+        with self._counts_lock:
+            self._queued += queued
+            self._running += running
+            metrics.set_gauge("db_queue_depth", self._queued)
+            metrics.set_gauge("db_calls_running", self._running)
+
+    async def _execute(self, name: str, query) -> Any:
+        """
+        Run query.execute() on the database thread pool.
+        Raises DatabaseTimeout when the call exceeds the timeout and
+        DatabaseUnavailable for network, gateway and other transient errors.
+        """
+        submitted = time.perf_counter()
+
+        def run():
+            self._track(queued=-1, running=1)
+            metrics.observe("db_queue_wait_seconds", time.perf_counter() - submitted)
+            try:
+                with metrics.timer(f"db_{name}_seconds"):
+                    return query.execute()
+            finally:
+                self._track(running=-1)
+
+        self._track(queued=1)
+        future = self._executor.submit(run)
+        # A call cancelled while still queued never runs, so leaves the queue here
+        future.add_done_callback(lambda f: f.cancelled() and self._track(queued=-1))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            # A queued call is dropped; a running one finishes in the background
+            metrics.inc("db_timeouts")
+            raise DatabaseTimeout(f"{name} timed out after {self.timeout}s")
+        except (httpx.TransportError, APIError) as e:
+            if isinstance(e, APIError) and not _is_transient(e):
+                raise
+            metrics.inc("db_unavailable")
+            raise DatabaseUnavailable(f"{name} failed: {type(e).__name__}") from e
+
+    async def _existing(self, table: str, columns: str, user_id: str, ids: List[str]) -> List[Dict]:
+        """Rows of a user with the given ids, before they are overwritten"""
+        if not ids:
+            return []
+        query = self.client.table(table).select(columns).eq("user_id", user_id).in_("id", ids)
+        result = await self._execute(f"{table}_existing", query)
+        return result.data
+
+    def _stats_lock(self, user_id: str) -> asyncio.Lock:
+        """Lock serializing the stats updates of one user in this process"""
+        lock = self._stats_locks.get(user_id)
+        if lock is None:
+            lock = self._stats_locks[user_id] = asyncio.Lock()
+        return lock
+
+    async def _apply_stats(self, user_id: str, deltas: Dict[str, Dict]):
+        """
+        Add counter deltas to the user's stats rows.
+        PostgREST has no atomic increment, so this is read-modify-write and
+        callers hold _stats_lock(user_id); rebuild_user_stats repairs drift
+        from writers in other processes.
+        """
+        if not deltas:
+            return
+        query = self.client.table("user_stats").select("*").eq("user_id", user_id).in_("exam_id", list(deltas))
+        current = {row["exam_id"]: row for row in (await self._execute("get_user_stats", query)).data}
+        rows = []
+        for exam_id, counters in deltas.items():
+            row = {"user_id": user_id, "exam_id": exam_id}
+            for name in STAT_FIELDS:
+                row[name] = (current.get(exam_id, {}).get(name) or 0) + counters[name]
+            rows.append(row)
+        await self._execute("apply_user_stats", self.client.table("user_stats").upsert(rows))
+
+    async def _save(self, name: str, table: str, columns: str, rows: List[Dict], contribution) -> List[Dict]:
+        """
+        Upsert rows of one user and update their stats by the difference
+        between the rows replaced and the rows written.
+        Concurrent saves of a user run one at a time, so no two of them
+        read the same stats rows before either writes.
+        Returns the rows written.
+        """
+        if not rows:
+            return []
+        user_id = rows[0]["user_id"]
+        async with self._stats_lock(user_id):
+            old = await self._existing(table, columns, user_id, [r["id"] for r in rows])
+            try:
+                result = await self._execute(name, self.client.table(table).upsert(rows))
+            except DatabaseUnavailable:
+                # The upsert may still have been applied
+                self._stale_stats.add(user_id)
+                raise
+            await self._update_stats(user_id, stats_deltas(old, result.data, contribution))
+        return result.data
+
+    async def _update_stats(self, user_id: str, deltas: Dict[str, Dict]):
+        """
+        Apply the deltas of a write whose rows are saved.
+        If an earlier write of the user failed after its rows may have been
+        saved, its retry finds them unchanged and has no delta to add, so
+        the user's stats are rebuilt instead.
+        """
+        try:
+            if user_id in self._stale_stats:
+                await self.rebuild_user_stats(user_id)
+                self._stale_stats.discard(user_id)
+            else:
+                await self._apply_stats(user_id, deltas)
+        except Exception:
+            self._stale_stats.add(user_id)
+            raise
+
     # ============ User Operations ============
 
     async def get_user_by_google_id(self, google_id: str) -> Optional[Dict]:
         """Get user by Google ID"""
         if not self.is_connected:
             return None
-        result = self.client.table("users").select("*").eq("google_id", google_id).execute()
+        result = await self._execute("get_user_by_google_id", self.client.table("users").select("*").eq("google_id", google_id))
         return result.data[0] if result.data else None
 
     async def get_user_by_id(self, user_id: str) -> Optional[Dict]:
         """Get user by ID"""
         if not self.is_connected:
             return None
-        result = self.client.table("users").select("*").eq("id", user_id).execute()
+        result = await self._execute("get_user_by_id", self.client.table("users").select("*").eq("id", user_id))
         return result.data[0] if result.data else None
 
     async def create_user(self, user_data: Dict) -> Dict:
@@ -48,7 +368,8 @@ class Database:
             raise Exception("Database not connected")
         user_data["created_at"] = datetime.utcnow().isoformat()
         user_data["updated_at"] = datetime.utcnow().isoformat()
-        result = self.client.table("users").insert(user_data).execute()
+        result = await self._execute("create_user", self.client.table("users").insert(user_data))
+        user_cache.invalidate(result.data[0]["id"])
         return result.data[0]
 
     async def update_user(self, user_id: str, user_data: Dict) -> Dict:
@@ -56,7 +377,9 @@ class Database:
         if not self.is_connected:
             raise Exception("Database not connected")
         user_data["updated_at"] = datetime.utcnow().isoformat()
-        result = self.client.table("users").update(user_data).eq("id", user_id).execute()
+        user_cache.invalidate(user_id)
+        result = await self._execute("update_user", self.client.table("users").update(user_data).eq("id", user_id))
+        user_cache.invalidate(user_id)
         return result.data[0]
 
     # ============ Quiz Session Operations ============
@@ -68,101 +391,216 @@ class Database:
         query = self.client.table("quiz_sessions").select("*").eq("user_id", user_id)
         if exam_id:
             query = query.eq("exam_id", exam_id)
-        result = query.order("start_time", desc=True).execute()
+        result = await self._execute("get_user_sessions", query.order("start_time", desc=True))
         return result.data
 
     async def save_session(self, user_id: str, session_data: Dict) -> Dict:
         """Save or update a quiz session"""
         if not self.is_connected:
             raise Exception("Database not connected")
+        # updated_at is stamped by the database (migrations/004_updated_at_trigger.sql)
         session_data["user_id"] = user_id
+        # Only sync stores the client's hash of a row
+        session_data["content_hash"] = None
         # Upsert based on session ID
-        result = self.client.table("quiz_sessions").upsert(session_data).execute()
-        return result.data[0]
+        rows = await self._save(
+            "save_session", "quiz_sessions", SESSION_STATS_COLUMNS, [session_data], session_contribution
+        )
+        return rows[0]
 
-    async def save_sessions_batch(self, user_id: str, sessions: List[Dict]) -> int:
+    async def save_sessions_batch(self, user_id: str, sessions: List[Dict]) -> List[str]:
         """Save multiple sessions"""
         if not self.is_connected:
-            return 0
+            return []
         for session in sessions:
             session["user_id"] = user_id
-        result = self.client.table("quiz_sessions").upsert(sessions).execute()
-        return len(result.data)
+            # Sync passes the client's hash; other writers clear it
+            session.setdefault("content_hash", None)
+        rows = await self._save(
+            "save_sessions_batch", "quiz_sessions", SESSION_STATS_COLUMNS, sessions, session_contribution
+        )
+        return [row["id"] for row in rows]
 
     # ============ Wrong Answer Operations ============
 
-    async def get_user_wrong_answers(self, user_id: str, exam_id: Optional[str] = None) -> List[Dict]:
+    async def get_user_wrong_answers(
+        self,
+        user_id: str,
+        exam_id: Optional[str] = None,
+        mastered: Optional[bool] = None
+    ) -> List[Dict]:
         """Get wrong answers for a user"""
         if not self.is_connected:
             return []
         query = self.client.table("wrong_answers").select("*").eq("user_id", user_id)
         if exam_id:
             query = query.eq("exam_id", exam_id)
-        result = query.execute()
+        if mastered is not None:
+            query = query.eq("mastered", mastered)
+        result = await self._execute("get_user_wrong_answers", query)
         return result.data
 
     async def save_wrong_answer(self, user_id: str, wrong_data: Dict) -> Dict:
         """Save or update a wrong answer"""
         if not self.is_connected:
             raise Exception("Database not connected")
+        # updated_at is stamped by the database (migrations/004_updated_at_trigger.sql)
         wrong_data["user_id"] = user_id
-        result = self.client.table("wrong_answers").upsert(wrong_data).execute()
-        return result.data[0]
+        # Only sync stores the client's hash of a row
+        wrong_data["content_hash"] = None
+        rows = await self._save(
+            "save_wrong_answer", "wrong_answers", WRONG_STATS_COLUMNS, [wrong_data], wrong_answer_contribution
+        )
+        return rows[0]
 
-    async def save_wrong_answers_batch(self, user_id: str, wrong_answers: List[Dict]) -> int:
+    async def save_wrong_answers_batch(self, user_id: str, wrong_answers: List[Dict]) -> List[str]:
         """Save multiple wrong answers"""
         if not self.is_connected:
-            return 0
+            return []
         for wa in wrong_answers:
             wa["user_id"] = user_id
-        result = self.client.table("wrong_answers").upsert(wrong_answers).execute()
-        return len(result.data)
+            # Sync passes the client's hash; other writers (write-behind) clear it
+            wa.setdefault("content_hash", None)
+        rows = await self._save(
+            "save_wrong_answers_batch", "wrong_answers", WRONG_STATS_COLUMNS, wrong_answers, wrong_answer_contribution
+        )
+        return [row["id"] for row in rows]
 
     async def mark_wrong_mastered(self, user_id: str, wrong_id: str) -> bool:
         """Mark a wrong answer as mastered"""
         if not self.is_connected:
             return False
-        self.client.table("wrong_answers").update({"mastered": True}).eq("id", wrong_id).eq("user_id", user_id).execute()
+        # Only rows that flip from unmastered change the stats
+        async with self._stats_lock(user_id):
+            try:
+                result = await self._execute(
+                    "mark_wrong_mastered",
+                    self.client.table("wrong_answers")
+                    .update({"mastered": True, "content_hash": None})
+                    .eq("id", wrong_id).eq("user_id", user_id).eq("mastered", False)
+                )
+            except DatabaseUnavailable:
+                self._stale_stats.add(user_id)
+                raise
+            unmastered = [{**row, "mastered": False} for row in result.data]
+            await self._update_stats(user_id, stats_deltas(unmastered, result.data, wrong_answer_contribution))
         return True
 
-    # ============ Stats Operations ============
+    def _changed_query(
+        self,
+        table: str,
+        user_id: str,
+        since: Optional[datetime],
+        after: Optional[Tuple[str, str]],
+        limit: Optional[int]
+    ):
+        """Rows changed since a time, keyset-paginated on (updated_at, id)"""
+        query = self.client.table(table).select("*").eq("user_id", user_id)
+        if since:
+            query = query.gt("updated_at", since.isoformat())
+        if after:
+            # Cursor values come from the client; quoted so "," "(" ")" stay literal
+            updated_at, row_id = (_quote_filter_value(v) for v in after)
+            query = query.or_(f"updated_at.gt.{updated_at},and(updated_at.eq.{updated_at},id.gt.{row_id})")
+        query = query.order("updated_at").order("id")
+        if limit:
+            query = query.limit(limit)
+        return query
+
+    async def get_sessions_changed(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        after: Optional[Tuple[str, str]] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Sessions changed since a time, ordered by (updated_at, id)"""
+        if not self.is_connected:
+            return []
+        query = self._changed_query("quiz_sessions", user_id, since, after, limit)
+        result = await self._execute("get_sessions_changed", query)
+        return result.data
+
+    async def get_wrong_answers_changed(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        after: Optional[Tuple[str, str]] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Wrong answers changed since a time, ordered by (updated_at, id)"""
+        if not self.is_connected:
+            return []
+        query = self._changed_query("wrong_answers", user_id, since, after, limit)
+        result = await self._execute("get_wrong_answers_changed", query)
+        return result.data
 
-    async def get_user_stats(self, user_id: str) -> Dict:
-        """Get user statistics"""
+
+    # ============ Sync Operations ============
+
+    async def get_content_hashes(self, user_id: str, table: str, ids: List[str]) -> Dict[str, Optional[str]]:
+        """Stored content hashes of a user's rows"""
         if not self.is_connected:
-            return {
-                "total_sessions": 0,
-                "total_questions": 0,
-                "correct_rate": 0,
-                "unmastered_wrong": 0
-            }
+            return {}
+        hashes = {}
+        for i in range(0, len(ids), HASH_LOOKUP_CHUNK_SIZE):
+            rows = await self._existing(table, "id,content_hash", user_id, ids[i:i + HASH_LOOKUP_CHUNK_SIZE])
+            hashes.update((row["id"], row["content_hash"]) for row in rows)
+        return hashes
+
+    # ============ Stats Operations ============
+
+    async def get_stats_record(self, user_id: str, exam_id: str) -> Optional[Dict]:
+        """Get a maintained stats row"""
+        query = self.client.table("user_stats").select("*").eq("user_id", user_id).eq("exam_id", exam_id)
+        result = await self._execute("get_user_stats", query)
+        return result.data[0] if result.data else None
+
+    async def list_user_ids(self) -> List[str]:
+        """IDs of all users"""
+        result = await self._execute("list_user_ids", self.client.table("users").select("id"))
+        return [row["id"] for row in result.data]
+
+    async def replace_user_stats(self, user_id: str, stats: Dict[str, Dict]):
+        """Replace all stats rows of a user"""
+        await self._execute("replace_user_stats", self.client.table("user_stats").delete().eq("user_id", user_id))
+        rows = [{"user_id": user_id, "exam_id": exam_id, **counters} for exam_id, counters in stats.items()]
+        if rows:
+            await self._execute("replace_user_stats", self.client.table("user_stats").insert(rows))
+
 
-        sessions = await self.get_user_sessions(user_id)
-        wrong_answers = await self.get_user_wrong_answers(user_id)
+def _is_transient(error: APIError) -> bool:
+    """Whether a PostgREST error may pass on retry"""
+    code = str(error.code or "")
+    if len(code) == 3 and code.isdigit():
+        # Error page without a PostgREST body (e.g. a 502 from the gateway); code is the HTTP status
+        return code >= "500"
+    return code in TRANSIENT_POSTGREST_CODES or code.startswith(TRANSIENT_SQLSTATE_CLASSES)
 
-        total_sessions = len(sessions)
-        completed_sessions = [s for s in sessions if s.get("completed")]
-        total_questions = sum(len(s.get("questions", [])) for s in completed_sessions)
 
-        total_score = sum(s.get("score", 0) for s in completed_sessions)
-        correct_rate = total_score / len(completed_sessions) if completed_sessions else 0
+def _quote_filter_value(value: str) -> str:
+    """Double-quote a value for a PostgREST logic filter such as or=(...)"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
 
-        unmastered_wrong = len([w for w in wrong_answers if not w.get("mastered")])
 
-        return {
-            "total_sessions": total_sessions,
-            "total_questions": total_questions,
-            "correct_rate": round(correct_rate, 1),
-            "unmastered_wrong": unmastered_wrong
-        }
+def create_database() -> Database:
+    """Create the storage backend selected by the settings"""
+    if settings.DATABASE_URL:
+        from .sql_database import SQLDatabase
+        database = SQLDatabase(settings.DATABASE_URL)
+    else:
+        database = SupabaseDatabase()
+    if settings.WRONG_ANSWER_BUFFER_ENABLED:
+        database.wrong_answer_buffer = WrongAnswerBuffer(database.save_wrong_answers_batch)
+    return database
 
 
 # Global database instance
-db = Database()
+db = create_database()
 
 
 def get_db() -> Database:
     """Dependency to get database instance"""
     if not db.is_connected:
         db.connect()
-    return db
+    return db
\ No newline at end of file
@@ -1,7 +1,7 @@
 """
 Pydantic schemas for API request/response validation
 """
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -70,6 +70,14 @@ class Exam(ExamBase):
     updated_at: datetime
 
 
+class QuarantinedFile(BaseModel):
+    """Exam file that failed to parse and is skipped until it changes"""
+    filename: str
+    modified_at: datetime
+    size: int
+    error: str
+
+
 # ============ Question ============
 
 class QuestionBase(BaseModel):
@@ -88,6 +96,42 @@ class QuestionBase(BaseModel):
     tags: List[str] = []
 
 
+class QuestionRef(BaseModel):
+    """Reference to a question within an exam"""
+    exam_id: str
+    question_id: str
+
+
+class QuestionBatchItem(QuestionRef):
+    """Batch lookup result; question is None when not found"""
+    question: Optional[Dict[str, Any]] = None
+
+
+class QuestionSearchHit(BaseModel):
+    """Ranked full-text search result"""
+    exam_id: str
+    question_id: str
+    domain: Optional[str] = None
+    score: float
+    snippet: str
+
+
+class QuizRequest(BaseModel):
+    """Random quiz assembly; domain_weights defaults to the exam's domain weights"""
+    count: int = Field(..., ge=1, le=500)
+    domain_weights: Optional[Dict[str, float]] = None
+    difficulties: Optional[List[str]] = None
+    seed: Optional[int] = None
+
+
+class QuizResponse(BaseModel):
+    """Sampled question set; the seed reproduces the same quiz"""
+    exam_id: str
+    seed: int
+    domain_counts: Dict[str, int]
+    questions: List[Dict[str, Any]]
+
+
 # ============ Progress & Quiz Session ============
 
 class QuizMode(str, Enum):
@@ -139,17 +183,49 @@ class WrongAnswer(WrongAnswerBase):
 # ============ Sync ============
 
 class SyncData(BaseModel):
-    """Data structure for syncing between frontend and backend"""
-    quiz_sessions: List[QuizSessionCreate] = []
-    wrong_answers: List[WrongAnswerCreate] = []
+    """
+    Data structure for syncing between frontend and backend.
+    Records are validated one by one (as QuizSessionCreate and
+    WrongAnswerCreate) so that an invalid record only rejects itself.
+    """
+    quiz_sessions: List[Dict[str, Any]] = []
+    wrong_answers: List[Dict[str, Any]] = []
     last_sync_at: Optional[datetime] = None
 
 
+class SyncRecordResult(BaseModel):
+    """Outcome of one synced record"""
+    type: str  # 'quiz_session' or 'wrong_answer'
+    id: Optional[str] = None
+    accepted: bool
+    unchanged: bool = False  # Accepted without a write, content hash matched
+    error: Optional[str] = None
+
+
+class SyncManifestEntry(BaseModel):
+    """A local record's id and content hash (see routers/progress.py content_hash)"""
+    id: str
+    hash: str
+
+
+class SyncManifest(BaseModel):
+    """Content hashes of the client's local records"""
+    quiz_sessions: List[SyncManifestEntry] = []
+    wrong_answers: List[SyncManifestEntry] = []
+
+
+class SyncManifestResponse(BaseModel):
+    """Ids of the records the server needs to receive"""
+    quiz_sessions: List[str]
+    wrong_answers: List[str]
+
+
 class SyncResponse(BaseModel):
     success: bool
     message: str
     synced_at: datetime
     stats: Dict[str, int]
+    results: List[SyncRecordResult] = []
 
 
 # ============ Video Generation ============
@@ -177,3 +253,4 @@ class VideoJob(BaseModel):
     message: Optional[str] = None
     video_url: Optional[str] = None
     created_at: datetime
+    queue_position: Optional[int] = None  # Set on pending jobs by /status
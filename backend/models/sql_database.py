@@ -0,0 +1,544 @@
+"""
+Database operations on PostgreSQL (asyncpg) or SQLite (aiosqlite) via SQLAlchemy async
+
+Rows are returned as plain dicts with ISO 8601 timestamps, the same shape
+the Supabase backend returns, so routers work unchanged on either.
+"""
+from sqlalchemy import (
+    MetaData, Table, Column, String, Float, Integer, Boolean, DateTime, JSON,
+    Index, select, update, bindparam, tuple_
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeout
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime, timezone
+import uuid
+
+from config import settings
+from metrics import metrics
+from .database import Database, DatabaseUnavailable, TRANSIENT_SQLSTATE_CLASSES, user_cache
+from .user_stats import STAT_FIELDS, stats_deltas, session_contribution, wrong_answer_contribution
+
+# Rows per multi-row INSERT; keeps bind parameters well under driver limits
+UPSERT_CHUNK_SIZE = 500
+
+JSONType = JSON().with_variant(postgresql.JSONB(), "postgresql")
+
+metadata = MetaData()
+
+users = Table(
+    "users", metadata,
+    Column("id", String, primary_key=True),
+    Column("google_id", String, unique=True, nullable=False),
+    Column("email", String, nullable=False),
+    Column("name", String, nullable=False),
+    Column("avatar", String),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+quiz_sessions = Table(
+    "quiz_sessions", metadata,
+    Column("id", String, primary_key=True),
+    Column("user_id", String, nullable=False),
+    Column("exam_id", String, nullable=False),
+    Column("mode", String, nullable=False),
+    Column("questions", JSONType, nullable=False),
+    Column("answers", JSONType, nullable=False),
+    Column("start_time", DateTime, nullable=False),
+    Column("end_time", DateTime),
+    Column("score", Float),
+    Column("completed", Boolean, nullable=False, default=False),
+    Column("question_count", Integer, nullable=False, default=0),
+    Column("content_hash", String),
+    Column("updated_at", DateTime, nullable=False),
+    Index("ix_quiz_sessions_user_start", "user_id", "start_time"),
+    Index("ix_quiz_sessions_user_updated", "user_id", "updated_at", "id"),
+)
+
+wrong_answers = Table(
+    "wrong_answers", metadata,
+    Column("id", String, primary_key=True),
+    Column("user_id", String, nullable=False),
+    Column("exam_id", String, nullable=False),
+    Column("question_id", String, nullable=False),
+    Column("user_answer", JSONType, nullable=False),
+    Column("correct_answer", JSONType, nullable=False),
+    Column("wrong_count", Integer, nullable=False, default=1),
+    Column("last_wrong_at", DateTime, nullable=False),
+    Column("mastered", Boolean, nullable=False, default=False),
+    Column("content_hash", String),
+    Column("updated_at", DateTime, nullable=False),
+    Index("ix_wrong_answers_user_exam", "user_id", "exam_id"),
+    Index("ix_wrong_answers_user_updated", "user_id", "updated_at", "id"),
+)
+
+# Maintained counters per user and exam; exam_id ALL_EXAMS holds the totals
+user_stats = Table(
+    "user_stats", metadata,
+    Column("user_id", String, primary_key=True),
+    Column("exam_id", String, primary_key=True),
+    Column("total_sessions", Integer, nullable=False, default=0),
+    Column("completed_sessions", Integer, nullable=False, default=0),
+    Column("total_questions", Integer, nullable=False, default=0),
+    Column("total_score", Float, nullable=False, default=0),
+    Column("unmastered_wrong", Integer, nullable=False, default=0),
+)
+
+# Columns of rows about to be overwritten that feed the stats
+STATS_COLUMNS = {
+    "quiz_sessions": ("id", "exam_id", "completed", "question_count", "score"),
+    "wrong_answers": ("id", "exam_id", "mastered"),
+}
+
+# Hot-path queries built once. SQLAlchemy caches their compiled form and
+# asyncpg prepares each once per pooled connection, so repeated calls only
+# bind parameters.
+SELECT_USER_BY_ID = select(users).where(users.c.id == bindparam("user_id"))
+SELECT_USER_BY_GOOGLE_ID = select(users).where(users.c.google_id == bindparam("google_id"))
+SELECT_SESSIONS = (
+    select(quiz_sessions)
+    .where(quiz_sessions.c.user_id == bindparam("user_id"))
+    .order_by(quiz_sessions.c.start_time.desc())
+)
+SELECT_SESSIONS_BY_EXAM = (
+    select(quiz_sessions)
+    .where(quiz_sessions.c.user_id == bindparam("user_id"))
+    .where(quiz_sessions.c.exam_id == bindparam("exam_id"))
+    .order_by(quiz_sessions.c.start_time.desc())
+)
+SELECT_USER_STATS = (
+    select(user_stats)
+    .where(user_stats.c.user_id == bindparam("user_id"))
+    .where(user_stats.c.exam_id == bindparam("exam_id"))
+)
+SELECT_WRONG_ANSWERS = select(wrong_answers).where(wrong_answers.c.user_id == bindparam("user_id"))
+SELECT_WRONG_ANSWERS_BY_EXAM = (
+    select(wrong_answers)
+    .where(wrong_answers.c.user_id == bindparam("user_id"))
+    .where(wrong_answers.c.exam_id == bindparam("exam_id"))
+)
+
+
+class utcnow(FunctionElement):
+    """
+    Current UTC time on the database clock, for updated_at.
+    Every writer stamps with the same clock that GET /sync compares against.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow, "postgresql")
+def _pg_utcnow(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(utcnow, "sqlite")
+def _sqlite_utcnow(element, compiler, **kw):
+    # Same text format SQLAlchemy stores DateTime values in, so they compare in order
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+def _select_changed(
+    table: Table,
+    user_id: str,
+    since: Optional[datetime],
+    after: Optional[Tuple[str, str]],
+    limit: Optional[int]
+):
+    """Rows changed since a time, keyset-paginated on (updated_at, id)"""
+    stmt = select(table).where(table.c.user_id == user_id)
+    if since:
+        stmt = stmt.where(table.c.updated_at > _to_datetime(since))
+    if after:
+        updated_at, row_id = after
+        stmt = stmt.where(tuple_(table.c.updated_at, table.c.id) > (_to_datetime(updated_at), row_id))
+    stmt = stmt.order_by(table.c.updated_at, table.c.id)
+    if limit:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def _to_datetime(value: Any) -> Any:
+    """Coerce ISO strings and aware datetimes to naive UTC for DateTime columns"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _to_row(table: Table, data: Dict) -> Dict:
+    """Keep the table's columns and normalize timestamps"""
+    row = {}
+    for column in table.columns:
+        if column.name in data:
+            value = data[column.name]
+            if isinstance(column.type, DateTime):
+                value = _to_datetime(value)
+            elif hasattr(value, "value"):  # Enums such as QuizMode
+                value = value.value
+            row[column.name] = value
+    return row
+
+
+def _session_row(user_id: str, session: Dict) -> Dict:
+    """Session row with owner, question count and database timestamp"""
+    row = _to_row(quiz_sessions, {
+        **session, "user_id": user_id,
+        # Only sync passes the client's hash; other writes clear a stale one
+        "content_hash": session.get("content_hash")
+    })
+    row["question_count"] = len(session.get("questions") or [])
+    row["updated_at"] = utcnow()
+    return row
+
+
+def _wrong_answer_row(user_id: str, wrong: Dict) -> Dict:
+    """Wrong answer row with owner and database timestamp"""
+    row = _to_row(wrong_answers, {
+        **wrong, "user_id": user_id,
+        # Only sync passes the client's hash; other writes clear a stale one
+        "content_hash": wrong.get("content_hash")
+    })
+    row["updated_at"] = utcnow()
+    return row
+
+
+def _is_transient(error: Exception) -> bool:
+    """Whether a driver error may pass on retry: lost connections, deadlocks, pool exhaustion"""
+    if isinstance(error, PoolTimeout):
+        return True
+    if not isinstance(error, DBAPIError):
+        return False
+    if error.connection_invalidated:
+        return True
+    sqlstate = getattr(error.orig, "sqlstate", None) or getattr(error.orig, "pgcode", None)
+    return bool(sqlstate) and sqlstate.startswith(TRANSIENT_SQLSTATE_CLASSES)
+
+
+def _to_dict(row) -> Dict:
+    """Result row to a dict with ISO 8601 timestamps"""
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in row._mapping.items()
+    }
+
+
+class SQLDatabase(Database):
+    """
+    PostgreSQL/SQLite backend on a pooled SQLAlchemy async engine.
+
+    postgresql+asyncpg:// URLs get a tuned connection pool and a
+    prepared statement cache; sqlite+aiosqlite:// works as a local stand-in.
+    Batch saves are chunked multi-row INSERT ... ON CONFLICT DO UPDATE.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine: Optional[AsyncEngine] = None
+
+    def connect(self) -> bool:
+        """Create the engine; connections are opened lazily by the pool"""
+        if self.engine is not None:
+            return True
+
+        url = make_url(self.url)
+        options: Dict[str, Any] = {}
+        if url.get_backend_name() == "postgresql":
+            if url.get_driver_name() == "asyncpg":
+                url = url.update_query_dict({
+                    "prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)
+                })
+            options.update(
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+                pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            )
+        self.engine = create_async_engine(url, **options)
+        return True
+
+    @property
+    def is_connected(self) -> bool:
+        return self.engine is not None
+
+    async def startup(self):
+        """Create missing tables"""
+        self.connect()
+        async with self.engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+
+    async def shutdown(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+
+    def _insert(self, table: Table):
+        """Dialect-specific INSERT that supports ON CONFLICT"""
+        if self.engine.dialect.name == "postgresql":
+            return postgresql.insert(table)
+        return sqlite.insert(table)
+
+    def _upsert(self, table: Table, rows: List[Dict]):
+        """
+        INSERT ... ON CONFLICT (id) DO UPDATE for rows of one user.
+        Rows whose id belongs to another user are left untouched.
+        """
+        stmt = self._insert(table).values(rows)
+        columns = {
+            name for row in rows for name in row
+            if name not in ("id", "user_id")
+        }
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={name: stmt.excluded[name] for name in columns},
+            where=table.c.user_id == stmt.excluded.user_id
+        ).returning(*table.columns)
+
+    async def _fetch(self, name: str, stmt, **params) -> List[Dict]:
+        with metrics.timer(f"db_{name}_seconds"):
+            async with self.engine.connect() as conn:
+                result = await conn.execute(stmt, params)
+                return [_to_dict(row) for row in result]
+
+    async def _write(self, name: str, stmt, params: Optional[Dict] = None) -> List[Dict]:
+        with metrics.timer(f"db_{name}_seconds"):
+            async with self.engine.begin() as conn:
+                result = await conn.execute(stmt, params or {})
+                return [_to_dict(row) for row in result]
+
+    async def _apply_stats(self, conn, user_id: str, deltas: Dict[str, Dict]):
+        """Add counter deltas to the user's stats rows in the open transaction"""
+        if not deltas:
+            return
+        # Sorted so concurrent transactions lock stats rows in the same order
+        stmt = self._insert(user_stats).values([
+            {"user_id": user_id, "exam_id": exam_id, **deltas[exam_id]}
+            for exam_id in sorted(deltas)
+        ])
+        await conn.execute(stmt.on_conflict_do_update(
+            index_elements=[user_stats.c.user_id, user_stats.c.exam_id],
+            set_={name: user_stats.c[name] + stmt.excluded[name] for name in STAT_FIELDS}
+        ))
+
+    async def _save(self, name: str, table: Table, rows: List[Dict], contribution) -> List[Dict]:
+        """
+        Upsert rows in chunks and update the user's stats by the difference
+        between the rows replaced and the rows written, in one transaction.
+        Returns the rows written.
+        Raises DatabaseUnavailable for errors that may pass on retry; the
+        transaction is rolled back, so a retry counts the rows again.
+        """
+        user_id = rows[0]["user_id"]
+        columns = [table.c[c] for c in STATS_COLUMNS[table.name]]
+        saved: List[Dict] = []
+        try:
+            with metrics.timer(f"db_{name}_seconds"):
+                async with self.engine.begin() as conn:
+                    old: List[Dict] = []
+                    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+                        chunk = rows[i:i + UPSERT_CHUNK_SIZE]
+                        result = await conn.execute(
+                            select(*columns)
+                            .where(table.c.user_id == user_id)
+                            .where(table.c.id.in_([r["id"] for r in chunk]))
+                            .with_for_update()
+                        )
+                        old.extend(dict(row._mapping) for row in result)
+                        result = await conn.execute(self._upsert(table, chunk))
+                        saved.extend(_to_dict(row) for row in result)
+                    await self._apply_stats(conn, user_id, stats_deltas(old, saved, contribution))
+        except (DBAPIError, PoolTimeout) as e:
+            if not _is_transient(e):
+                raise
+            metrics.inc("db_unavailable")
+            raise DatabaseUnavailable(f"{name} failed: {type(e).__name__}") from e
+        return saved
+
+    # ============ User Operations ============
+
+    async def get_user_by_google_id(self, google_id: str) -> Optional[Dict]:
+        """Get user by Google ID"""
+        rows = await self._fetch("get_user_by_google_id", SELECT_USER_BY_GOOGLE_ID, google_id=google_id)
+        return rows[0] if rows else None
+
+    async def get_user_by_id(self, user_id: str) -> Optional[Dict]:
+        """Get user by ID"""
+        rows = await self._fetch("get_user_by_id", SELECT_USER_BY_ID, user_id=user_id)
+        return rows[0] if rows else None
+
+    async def create_user(self, user_data: Dict) -> Dict:
+        """Create a new user"""
+        now = datetime.utcnow()
+        row = _to_row(users, {"id": str(uuid.uuid4()), **user_data})
+        row["created_at"] = row["updated_at"] = now
+        rows = await self._write("create_user", users.insert().values(row).returning(*users.columns))
+        user_cache.invalidate(rows[0]["id"])
+        return rows[0]
+
+    async def update_user(self, user_id: str, user_data: Dict) -> Dict:
+        """Update user data"""
+        values = _to_row(users, user_data)
+        values.pop("id", None)
+        values["updated_at"] = datetime.utcnow()
+        user_cache.invalidate(user_id)
+        rows = await self._write(
+            "update_user",
+            update(users).where(users.c.id == user_id).values(values).returning(*users.columns)
+        )
+        user_cache.invalidate(user_id)
+        return rows[0]
+
+    # ============ Quiz Session Operations ============
+
+    async def get_user_sessions(self, user_id: str, exam_id: Optional[str] = None) -> List[Dict]:
+        """Get quiz sessions for a user, newest first"""
+        if exam_id:
+            return await self._fetch("get_user_sessions", SELECT_SESSIONS_BY_EXAM, user_id=user_id, exam_id=exam_id)
+        return await self._fetch("get_user_sessions", SELECT_SESSIONS, user_id=user_id)
+
+    async def save_session(self, user_id: str, session_data: Dict) -> Dict:
+        """Save or update a quiz session"""
+        row = _session_row(user_id, session_data)
+        rows = await self._save("save_session", quiz_sessions, [row], session_contribution)
+        if not rows:
+            raise Exception(f"Session {row.get('id')} belongs to another user")
+        return rows[0]
+
+    async def save_sessions_batch(self, user_id: str, sessions: List[Dict]) -> List[str]:
+        """Save multiple sessions"""
+        rows = [_session_row(user_id, s) for s in sessions]
+        if not rows:
+            return []
+        saved = await self._save("save_sessions_batch", quiz_sessions, rows, session_contribution)
+        return [row["id"] for row in saved]
+
+    async def get_sessions_changed(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        after: Optional[Tuple[str, str]] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Sessions changed since a time, ordered by (updated_at, id)"""
+        return await self._fetch(
+            "get_sessions_changed", _select_changed(quiz_sessions, user_id, since, after, limit)
+        )
+
+    # ============ Wrong Answer Operations ============
+
+    async def get_user_wrong_answers(
+        self,
+        user_id: str,
+        exam_id: Optional[str] = None,
+        mastered: Optional[bool] = None
+    ) -> List[Dict]:
+        """Get wrong answers for a user"""
+        if mastered is not None:
+            stmt = SELECT_WRONG_ANSWERS_BY_EXAM if exam_id else SELECT_WRONG_ANSWERS
+            stmt = stmt.where(wrong_answers.c.mastered == bindparam("mastered"))
+            return await self._fetch(
+                "get_user_wrong_answers", stmt, user_id=user_id, mastered=mastered,
+                **({"exam_id": exam_id} if exam_id else {})
+            )
+        if exam_id:
+            return await self._fetch(
+                "get_user_wrong_answers", SELECT_WRONG_ANSWERS_BY_EXAM, user_id=user_id, exam_id=exam_id
+            )
+        return await self._fetch("get_user_wrong_answers", SELECT_WRONG_ANSWERS, user_id=user_id)
+
+    async def save_wrong_answer(self, user_id: str, wrong_data: Dict) -> Dict:
+        """Save or update a wrong answer"""
+        row = _wrong_answer_row(user_id, wrong_data)
+        rows = await self._save("save_wrong_answer", wrong_answers, [row], wrong_answer_contribution)
+        if not rows:
+            raise Exception(f"Wrong answer {row.get('id')} belongs to another user")
+        return rows[0]
+
+    async def save_wrong_answers_batch(self, user_id: str, wrong_answers_data: List[Dict]) -> List[str]:
+        """Save multiple wrong answers"""
+        rows = [_wrong_answer_row(user_id, w) for w in wrong_answers_data]
+        if not rows:
+            return []
+        saved = await self._save("save_wrong_answers_batch", wrong_answers, rows, wrong_answer_contribution)
+        return [row["id"] for row in saved]
+
+    async def mark_wrong_mastered(self, user_id: str, wrong_id: str) -> bool:
+        """Mark a wrong answer as mastered"""
+        with metrics.timer("db_mark_wrong_mastered_seconds"):
+            async with self.engine.begin() as conn:
+                # Only a row that flips from unmastered changes the stats
+                result = await conn.execute(
+                    update(wrong_answers)
+                    .where(wrong_answers.c.id == wrong_id)
+                    .where(wrong_answers.c.user_id == user_id)
+                    .where(wrong_answers.c.mastered.is_(False))
+                    .values(mastered=True, content_hash=None, updated_at=utcnow())
+                    .returning(wrong_answers.c.exam_id)
+                )
+                flipped = [{"exam_id": row.exam_id, "mastered": False} for row in result]
+                if flipped:
+                    await self._apply_stats(conn, user_id, stats_deltas(flipped, [], wrong_answer_contribution))
+                    return True
+
+                result = await conn.execute(
+                    select(wrong_answers.c.id)
+                    .where(wrong_answers.c.id == wrong_id)
+                    .where(wrong_answers.c.user_id == user_id)
+                )
+                return result.first() is not None
+
+    async def get_wrong_answers_changed(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        after: Optional[Tuple[str, str]] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Wrong answers changed since a time, ordered by (updated_at, id)"""
+        return await self._fetch(
+            "get_wrong_answers_changed", _select_changed(wrong_answers, user_id, since, after, limit)
+        )
+
+    # ============ Sync Operations ============
+
+    async def get_content_hashes(self, user_id: str, table: str, ids: List[str]) -> Dict[str, Optional[str]]:
+        """Stored content hashes of a user's rows"""
+        target = metadata.tables[table]
+        hashes = {}
+        for i in range(0, len(ids), UPSERT_CHUNK_SIZE):
+            rows = await self._fetch(
+                "get_content_hashes",
+                select(target.c.id, target.c.content_hash)
+                .where(target.c.user_id == user_id)
+                .where(target.c.id.in_(ids[i:i + UPSERT_CHUNK_SIZE]))
+            )
+            hashes.update((row["id"], row["content_hash"]) for row in rows)
+        return hashes
+
+    # ============ Stats Operations ============
+
+    async def get_stats_record(self, user_id: str, exam_id: str) -> Optional[Dict]:
+        """Get a maintained stats row"""
+        rows = await self._fetch("get_user_stats", SELECT_USER_STATS, user_id=user_id, exam_id=exam_id)
+        return rows[0] if rows else None
+
+    async def list_user_ids(self) -> List[str]:
+        """IDs of all users"""
+        rows = await self._fetch("list_user_ids", select(users.c.id))
+        return [row["id"] for row in rows]
+
+    async def replace_user_stats(self, user_id: str, stats: Dict[str, Dict]):
+        """Replace all stats rows of a user"""
+        async with self.engine.begin() as conn:
+            await conn.execute(user_stats.delete().where(user_stats.c.user_id == user_id))
+            if stats:
+                await conn.execute(user_stats.insert(), [
+                    {"user_id": user_id, "exam_id": exam_id, **counters}
+                    for exam_id, counters in stats.items()
+                ])
@@ -0,0 +1,95 @@
+"""
+Per-user progress statistics maintained incrementally on write
+
+Each user has one stats row per exam plus an overall row (exam_id
+ALL_EXAMS). Writes compute how much the saved rows change the counters
+and apply only that difference, so reading stats is a single-row lookup.
+"""
+from typing import Callable, Dict, Iterable, Optional
+
+# exam_id of the row holding a user's totals over all exams
+ALL_EXAMS = ""
+
+STAT_FIELDS = (
+    "total_sessions",
+    "completed_sessions",
+    "total_questions",
+    "total_score",
+    "unmastered_wrong",
+)
+
+Counters = Dict[str, float]
+
+
+def question_count(session: Dict) -> int:
+    """Number of questions in a session row"""
+    if session.get("question_count") is not None:
+        return session["question_count"]
+    return len(session.get("questions") or [])
+
+
+def session_contribution(session: Dict) -> Counters:
+    """What one quiz session adds to the counters"""
+    completed = bool(session.get("completed"))
+    return {
+        "total_sessions": 1,
+        "completed_sessions": 1 if completed else 0,
+        "total_questions": question_count(session) if completed else 0,
+        "total_score": (session.get("score") or 0) if completed else 0,
+    }
+
+
+def wrong_answer_contribution(wrong: Dict) -> Counters:
+    """What one wrong answer adds to the counters"""
+    return {"unmastered_wrong": 0 if wrong.get("mastered") else 1}
+
+
+def stats_deltas(
+    old_rows: Iterable[Dict],
+    new_rows: Iterable[Dict],
+    contribution: Callable[[Dict], Counters]
+) -> Dict[str, Counters]:
+    """
+    Counter changes per exam_id (and ALL_EXAMS) from replacing old_rows
+    with new_rows. Exams whose counters do not change are left out.
+    """
+    deltas: Dict[str, Counters] = {}
+
+    def add(row: Dict, sign: int):
+        for exam_id in {row.get("exam_id") or ALL_EXAMS, ALL_EXAMS}:
+            counters = deltas.setdefault(exam_id, dict.fromkeys(STAT_FIELDS, 0))
+            for name, value in contribution(row).items():
+                counters[name] += sign * value
+
+    for row in old_rows:
+        add(row, -1)
+    for row in new_rows:
+        add(row, 1)
+
+    return {
+        exam_id: counters for exam_id, counters in deltas.items()
+        if any(counters.values())
+    }
+
+
+def compute_stats(sessions: Iterable[Dict], wrong_answers: Iterable[Dict]) -> Dict[str, Counters]:
+    """Counters per exam_id recomputed from scratch (used to rebuild)"""
+    stats = stats_deltas([], sessions, session_contribution)
+    for exam_id, counters in stats_deltas([], wrong_answers, wrong_answer_contribution).items():
+        target = stats.setdefault(exam_id, dict.fromkeys(STAT_FIELDS, 0))
+        for name, value in counters.items():
+            target[name] += value
+    return stats
+
+
+def format_stats(counters: Optional[Dict]) -> Dict:
+    """API shape of a stats row"""
+    counters = counters or {}
+    completed = counters.get("completed_sessions") or 0
+    correct_rate = (counters.get("total_score") or 0) / completed if completed else 0
+    return {
+        "total_sessions": int(counters.get("total_sessions") or 0),
+        "total_questions": int(counters.get("total_questions") or 0),
+        "correct_rate": round(correct_rate, 1),
+        "unmastered_wrong": int(counters.get("unmastered_wrong") or 0)
+    }
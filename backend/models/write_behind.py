@@ -0,0 +1,153 @@
+"""
+Write-behind buffer for wrong answers
+
+POST /api/progress/wrong-answers is called once per mistake. When the
+buffer is enabled, updates are held in memory and coalesced per
+(user_id, id): the newest update replaces the pending one, exactly as
+its upsert would have replaced the stored row (clients send the total
+wrong_count, not an increment). Pending rows are written with
+save_wrong_answers_batch when WRONG_ANSWER_FLUSH_SIZE rows are pending,
+when the oldest is WRONG_ANSWER_FLUSH_INTERVAL_SECONDS old, and at
+shutdown.
+
+Durability bound: a crash loses at most the rows pending at that moment,
+never more than WRONG_ANSWER_BUFFER_MAX_PENDING and normally no older
+than the flush interval. Pending rows, the age of the oldest one, flushes
+and failures are reported in metrics.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+from metrics import metrics
+
+Key = Tuple[str, str]
+
+
+class WrongAnswerBuffer:
+    """Coalescing write-behind buffer in front of save_wrong_answers_batch"""
+
+    def __init__(
+        self,
+        save_batch: Callable[[str, List[Dict]], Awaitable[List[str]]],
+        flush_size: int = settings.WRONG_ANSWER_FLUSH_SIZE,
+        flush_interval: float = settings.WRONG_ANSWER_FLUSH_INTERVAL_SECONDS,
+        max_pending: int = settings.WRONG_ANSWER_BUFFER_MAX_PENDING
+    ):
+        self.save_batch = save_batch
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Key, Dict] = {}
+        # monotonic time each pending row was first buffered
+        self._since: Dict[Key, float] = {}
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _report(self):
+        metrics.set_gauge("wrong_answer_buffer_pending", len(self._pending))
+        oldest = min(self._since.values(), default=None)
+        metrics.set_gauge(
+            "wrong_answer_buffer_oldest_seconds",
+            round(time.monotonic() - oldest, 3) if oldest is not None else 0.0
+        )
+
+    def start(self):
+        """Start the background flusher"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the flusher and write everything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._pending:
+            print(f"Lost {len(self._pending)} buffered wrong answers at shutdown")
+
+    async def add(self, user_id: str, wrong_data: Dict) -> Dict:
+        """Buffer a wrong answer; returns the row as it will be written"""
+        key = (user_id, wrong_data["id"])
+        row = {**wrong_data, "user_id": user_id}
+        if key in self._pending:
+            metrics.inc("wrong_answer_buffer_coalesced")
+        else:
+            self._since[key] = time.monotonic()
+        self._pending[key] = row
+        metrics.inc("wrong_answer_buffer_added")
+        self._report()
+
+        if len(self._pending) >= self.max_pending:
+            # Over the durability bound: write before accepting more
+            await self.flush()
+        elif len(self._pending) >= self.flush_size:
+            self._wakeup.set()
+        return row
+
+    async def flush(self, user_id: Optional[str] = None):
+        """
+        Write pending rows (only those of user_id when given).
+        Rows of a user whose write fails stay pending for the next flush.
+        """
+        async with self._lock:
+            keys = [k for k in self._pending if user_id is None or k[0] == user_id]
+            if not keys:
+                return
+            taken = {k: (self._pending.pop(k), self._since.pop(k)) for k in keys}
+
+            by_user: Dict[str, List[Key]] = {}
+            for key in keys:
+                by_user.setdefault(key[0], []).append(key)
+
+            async def write(uid: str, user_keys: List[Key]):
+                rows = [dict(taken[k][0]) for k in user_keys]
+                try:
+                    await self.save_batch(uid, rows)
+                    metrics.inc("wrong_answer_buffer_flushed", len(rows))
+                except Exception as e:
+                    metrics.inc("wrong_answer_buffer_flush_failures")
+                    print(f"Wrong answer flush failed for {uid}, {len(rows)} rows kept: {e}")
+                    for k in user_keys:
+                        row, since = taken[k]
+                        # A newer update that arrived during the write wins
+                        self._pending.setdefault(k, row)
+                        self._since[k] = min(since, self._since.get(k, since))
+
+            with metrics.timer("wrong_answer_buffer_flush_seconds"):
+                await asyncio.gather(*(write(uid, user_keys) for uid, user_keys in by_user.items()))
+            self._report()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._next_deadline())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._due():
+                await self.flush()
+                if self._due():
+                    # The write failed; back off instead of retrying at once
+                    await asyncio.sleep(self.flush_interval)
+
+    def _next_deadline(self) -> float:
+        """Seconds until the oldest pending row reaches the flush interval"""
+        oldest = min(self._since.values(), default=None)
+        if oldest is None:
+            return self.flush_interval
+        return max(0.0, oldest + self.flush_interval - time.monotonic())
+
+    def _due(self) -> bool:
+        return len(self._pending) >= self.flush_size or (
+            bool(self._pending) and self._next_deadline() == 0.0
+        )
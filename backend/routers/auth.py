@@ -8,15 +8,20 @@ from google.auth.transport import requests
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from typing import Optional
+import time
 import uuid
 
 from models.schemas import GoogleAuthRequest, AuthResponse, User
-from models.database import Database, get_db
+from models.database import Database, get_db, user_cache
+from cache import TTLCache
 from config import settings
 
 router = APIRouter()
 security = HTTPBearer(auto_error=False)
 
+# Verified JWT claims by token, so hot tokens skip signature verification
+token_cache = TTLCache("token", settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL_SECONDS)
+
 
 def create_access_token(user_id: str) -> str:
     """Create JWT access token"""
@@ -31,11 +36,19 @@ def create_access_token(user_id: str) -> str:
 
 def verify_token(token: str) -> Optional[str]:
     """Verify JWT token and return user_id"""
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        return payload.get("sub")
-    except JWTError:
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+        except JWTError:
+            return None
+        # Never keep a token cached past its expiry
+        ttl = payload["exp"] - time.time() if "exp" in payload else None
+        token_cache.set(token, payload, ttl)
+    elif "exp" in payload and payload["exp"] <= time.time():
+        token_cache.invalidate(token)
         return None
+    return payload.get("sub")
 
 
 async def get_current_user(
@@ -50,7 +63,12 @@ async def get_current_user(
     if not user_id:
         return None
 
-    return await db.get_user_by_id(user_id)
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await db.get_user_by_id(user_id)
+        if user is not None:
+            user_cache.set(user_id, user)
+    return user
 
 
 async def require_user(
@@ -1,100 +1,277 @@
 """
 Exams router - Exam and question management
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from fastapi.responses import FileResponse
-from typing import List, Optional
+from typing import Dict, List, Optional
+from datetime import datetime
+import asyncio
 import os
-import json
+import random
 
-from models.schemas import Exam, QuestionBase
+from models.schemas import (
+    Exam, QuarantinedFile,
+    QuestionRef, QuestionBatchItem, QuestionSearchHit,
+    QuizRequest, QuizResponse
+)
+from services.exam_catalog import ExamCatalog, ExamRecord, get_catalog, DATA_DIR
+from services.json_payload import JSONPayload, payload_response
+from services.quiz_sampler import default_weights
 
 router = APIRouter()
 
-# Path to exam data files
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static", "sample-data")
+# Maximum number of questions resolved by one batch request
+MAX_BATCH_QUESTIONS = 500
 
+# Maximum page size for question listing
+MAX_PAGE_SIZE = 500
 
-def load_exam_data(filename: str) -> dict:
-    """Load exam data from JSON file"""
-    filepath = os.path.join(DATA_DIR, filename)
-    if not os.path.exists(filepath):
-        raise HTTPException(status_code=404, detail=f"Exam file not found: {filename}")
+# Maximum number of search results
+MAX_SEARCH_RESULTS = 100
 
-    with open(filepath, "r", encoding="utf-8") as f:
-        return json.load(f)
+
+async def get_exam_record(catalog: ExamCatalog, exam_id: str) -> ExamRecord:
+    """Get a loaded exam record or raise 404"""
+    try:
+        record = await catalog.fetch_record(exam_id)
+    except (OSError, ValueError):
+        record = None
+
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Exam not found: {exam_id}")
+    return record
 
 
 @router.get("/", response_model=List[dict])
-async def list_exams(language: Optional[str] = None):
+async def list_exams(
+    language: Optional[str] = None,
+    namespace: Optional[str] = None,
+    provider: Optional[str] = None,
+    catalog: ExamCatalog = Depends(get_catalog)
+):
     """
     List all available exams.
-    Optionally filter by language (zh-CN, ja).
+    Optionally filter by language (zh-CN, ja), namespace (the data
+    subdirectory, e.g. middle-school; empty for top-level exams) and provider.
     """
-    exams = []
+    return catalog.list_exams(language, namespace, provider)
+
+
+@router.get("/_namespaces", response_model=Dict[str, int])
+async def list_namespaces(catalog: ExamCatalog = Depends(get_catalog)):
+    """Number of exams per namespace"""
+    return catalog.list_namespaces()
 
-    if not os.path.exists(DATA_DIR):
-        return exams
 
-    for filename in os.listdir(DATA_DIR):
-        if filename.endswith(".json"):
-            try:
-                data = load_exam_data(filename)
-                exam = data.get("exam", {})
-                if language and exam.get("language") != language:
-                    continue
-                exams.append(exam)
-            except Exception as e:
-                print(f"Error loading {filename}: {e}")
-                continue
+@router.get("/_quarantine", response_model=List[QuarantinedFile])
+async def list_quarantine(catalog: ExamCatalog = Depends(get_catalog)):
+    """List exam files that failed to parse and are skipped until they change"""
+    return [
+        QuarantinedFile(
+            filename=entry.filename,
+            modified_at=datetime.utcfromtimestamp(entry.mtime_ns / 1e9),
+            size=entry.size,
+            error=entry.error
+        )
+        for entry in catalog.list_quarantine()
+    ]
+
+
+@router.get("/search", response_model=List[QuestionSearchHit])
+async def search_questions(
+    q: str = Query(..., min_length=1),
+    language: Optional[str] = None,
+    exam_id: Optional[str] = None,
+    domain: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+    catalog: ExamCatalog = Depends(get_catalog)
+):
+    """
+    Full-text search over the question bank.
+    Chinese and Japanese are matched by character bigrams, other text by words.
+    """
+    if not catalog.search_ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Search index is warming up",
+            headers={"Retry-After": "5"}
+        )
 
-    return exams
+    hits = catalog.search(q, language, exam_id, domain, limit)
+    return [
+        QuestionSearchHit(
+            exam_id=hit.exam_id,
+            question_id=hit.question_id,
+            domain=hit.domain,
+            score=hit.score,
+            snippet=hit.snippet
+        )
+        for hit in hits
+    ]
+
+
+@router.post("/questions:batchGet", response_model=List[QuestionBatchItem])
+async def batch_get_questions(
+    refs: List[QuestionRef],
+    catalog: ExamCatalog = Depends(get_catalog)
+):
+    """
+    Resolve many questions across exams in one round trip.
+    Results follow the request order; missing questions have question=null.
+    """
+    if len(refs) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many questions, maximum is {MAX_BATCH_QUESTIONS}"
+        )
+
+    async def fetch(ref: QuestionRef) -> Optional[dict]:
+        try:
+            return await catalog.fetch_question(ref.exam_id, ref.question_id)
+        except (OSError, ValueError):
+            return None
+
+    # Exams missing from the cache load concurrently, each only once
+    questions = await asyncio.gather(*(fetch(ref) for ref in refs))
+    return [
+        QuestionBatchItem(
+            exam_id=ref.exam_id,
+            question_id=ref.question_id,
+            question=question
+        )
+        for ref, question in zip(refs, questions)
+    ]
 
 
 @router.get("/{exam_id}")
-async def get_exam(exam_id: str):
+async def get_exam(
+    exam_id: str,
+    request: Request,
+    catalog: ExamCatalog = Depends(get_catalog)
+):
     """Get exam details by ID"""
-    # Try to find the exam in any JSON file
-    if not os.path.exists(DATA_DIR):
-        raise HTTPException(status_code=404, detail="Data directory not found")
+    record = await get_exam_record(catalog, exam_id)
+    return await payload_response(request, record.payload)
+
 
-    for filename in os.listdir(DATA_DIR):
-        if filename.endswith(".json"):
-            try:
-                data = load_exam_data(filename)
-                exam = data.get("exam", {})
-                if exam.get("id") == exam_id:
-                    return data
-            except:
-                continue
+# Items are whole questions (QuestionBase) unless fields projects them
+QUESTIONS_RESPONSES = {
+    200: {
+        "description": "Questions, or only the requested fields of each question",
+        "content": {"application/json": {"schema": {"type": "array", "items": {"type": "object"}}}},
+        "headers": {
+            "X-Next-Cursor": {
+                "description": "Cursor of the next page; absent on the last page",
+                "schema": {"type": "string"}
+            },
+            "ETag": {"description": "Entity tag of the page", "schema": {"type": "string"}}
+        }
+    }
+}
 
-    raise HTTPException(status_code=404, detail=f"Exam not found: {exam_id}")
 
+@router.get("/{exam_id}/questions", responses=QUESTIONS_RESPONSES)
+async def get_exam_questions(
+    exam_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    catalog: ExamCatalog = Depends(get_catalog)
+):
+    """
+    Get questions for an exam.
+
+    - fields: comma-separated fields to return (e.g. id,domain,difficulty)
+    - limit: page size; the next page's cursor is sent in X-Next-Cursor
+    - cursor: ID of the first question of the page
+    """
+    record = await get_exam_record(catalog, exam_id)
+
+    projection = ()
+    if fields:
+        projection = tuple(sorted({f.strip() for f in fields.split(",") if f.strip()}))
+    view = record.view(projection)
 
-@router.get("/{exam_id}/questions", response_model=List[QuestionBase])
-async def get_exam_questions(exam_id: str):
-    """Get all questions for an exam"""
-    data = await get_exam(exam_id)
-    return data.get("questions", [])
+    if limit is None and cursor is None:
+        return await payload_response(request, view.payload)
+
+    start = 0
+    if cursor is not None:
+        if cursor not in record.positions:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+        start = record.positions[cursor]
+
+    end = start + (limit or MAX_PAGE_SIZE)
+    response = await payload_response(request, JSONPayload.from_data(view.items[start:end]))
+    if end < len(record.questions):
+        response.headers["X-Next-Cursor"] = str(record.questions[end].get("id"))
+    return response
+
+
+@router.post("/{exam_id}/quiz", response_model=QuizResponse)
+async def create_quiz(
+    exam_id: str,
+    quiz: QuizRequest,
+    catalog: ExamCatalog = Depends(get_catalog)
+):
+    """
+    Assemble a random question set.
+
+    Questions are split across domains by domain_weights (domain id ->
+    weight, default the exam's domains[].weight) and optionally limited to
+    the given difficulties. Fewer than count questions are returned when
+    not enough match.
+    """
+    record = await get_exam_record(catalog, exam_id)
+    weights = quiz.domain_weights
+    if weights is None:
+        weights = default_weights(record.data.get("exam", {}))
+    if any(w < 0 for w in weights.values()):
+        raise HTTPException(status_code=400, detail="Domain weights must not be negative")
+
+    seed = quiz.seed if quiz.seed is not None else random.getrandbits(32)
+    difficulties = tuple(quiz.difficulties) if quiz.difficulties is not None else None
+    positions, domain_counts = record.sampler.sample(quiz.count, weights, difficulties, seed)
+
+    return QuizResponse(
+        exam_id=exam_id,
+        seed=seed,
+        domain_counts=domain_counts,
+        questions=[record.questions[p] for p in positions]
+    )
 
 
 @router.get("/{exam_id}/questions/{question_id}")
-async def get_question(exam_id: str, question_id: str):
+async def get_question(
+    exam_id: str,
+    question_id: str,
+    catalog: ExamCatalog = Depends(get_catalog)
+):
     """Get a specific question"""
-    data = await get_exam(exam_id)
-    questions = data.get("questions", [])
-
-    for q in questions:
-        if q.get("id") == question_id:
-            return q
+    question = (await get_exam_record(catalog, exam_id)).get_question(question_id)
+    if question:
+        return question
 
     raise HTTPException(status_code=404, detail=f"Question not found: {question_id}")
 
 
-@router.get("/file/{filename}")
-async def get_exam_file(filename: str):
+@router.get("/file/{filename:path}")
+async def get_exam_file(
+    filename: str,
+    request: Request,
+    catalog: ExamCatalog = Depends(get_catalog)
+):
     """Download exam JSON file"""
-    filepath = os.path.join(DATA_DIR, filename)
-    if not os.path.exists(filepath):
+    try:
+        record = await catalog.fetch_record_by_filename(filename)
+    except (OSError, ValueError):
+        record = None
+    if record:
+        return await payload_response(request, record.file_payload, filename=os.path.basename(filename))
+
+    # Files without an indexed exam are streamed from disk
+    filepath = os.path.realpath(os.path.join(DATA_DIR, filename))
+    if not filepath.startswith(os.path.realpath(DATA_DIR) + os.sep) or not os.path.isfile(filepath):
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(filepath, media_type="application/json", filename=filename)
+    return FileResponse(filepath, media_type="application/json", filename=os.path.basename(filename))
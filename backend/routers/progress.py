@@ -1,19 +1,56 @@
 """
 Progress router - User progress sync between frontend and backend
 """
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, ValidationError
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Type
+from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import json
+import logging
 
 from models.schemas import (
     QuizSession, QuizSessionCreate,
     WrongAnswer, WrongAnswerCreate,
-    SyncData, SyncResponse
+    SyncData, SyncResponse, SyncRecordResult,
+    SyncManifest, SyncManifestEntry, SyncManifestResponse
 )
-from models.database import Database, get_db
+from models.database import Database, DatabaseTimeout, DatabaseUnavailable, get_db
+from config import settings
+from metrics import metrics
 from routers.auth import get_current_user, require_user
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Maximum rows per table in one page of GET /sync
+MAX_SYNC_PAGE_SIZE = 1000
+
+# Maximum records per table in one sync manifest
+MAX_MANIFEST_SIZE = 10000
+
+# Fields set by the server, excluded from content hashes
+SERVER_FIELDS = {"user_id", "updated_at", "content_hash", "question_count"}
+
+
+def encode_cursor(row: dict) -> str:
+    """Keyset cursor of a row: its updated_at and id"""
+    return f"{row['updated_at']}|{row['id']}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Parse a cursor from encode_cursor or raise 400"""
+    if not cursor:
+        return None
+    updated_at, sep, row_id = cursor.partition("|")
+    try:
+        datetime.fromisoformat(updated_at)
+    except ValueError:
+        sep = ""
+    if not sep or not row_id:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+    return updated_at, row_id
 
 
 @router.get("/sessions", response_model=List[QuizSession])
@@ -46,12 +83,8 @@ async def get_wrong_answers(
     db: Database = Depends(get_db)
 ):
     """Get user's wrong answers"""
-    wrong_answers = await db.get_user_wrong_answers(user["id"], exam_id)
-
-    if mastered is not None:
-        wrong_answers = [w for w in wrong_answers if w.get("mastered") == mastered]
-
-    return wrong_answers
+    await db.flush_wrong_answers(user["id"])
+    return await db.get_user_wrong_answers(user["id"], exam_id, mastered)
 
 
 @router.post("/wrong-answers", response_model=WrongAnswer)
@@ -60,8 +93,8 @@ async def save_wrong_answer(
     user: dict = Depends(require_user),
     db: Database = Depends(get_db)
 ):
-    """Save a wrong answer"""
-    result = await db.save_wrong_answer(user["id"], wrong.model_dump())
+    """Save a wrong answer (buffered when the write-behind buffer is enabled)"""
+    result = await db.queue_wrong_answer(user["id"], wrong.model_dump())
     return result
 
 
@@ -72,12 +105,136 @@ async def mark_mastered(
     db: Database = Depends(get_db)
 ):
     """Mark a wrong answer as mastered"""
+    await db.flush_wrong_answers(user["id"])
     success = await db.mark_wrong_mastered(user["id"], wrong_id)
     if not success:
         raise HTTPException(status_code=404, detail="Wrong answer not found")
     return {"message": "Marked as mastered"}
 
 
+def content_hash(record: dict) -> str:
+    """
+    SHA-256 of a record as the client holds it: compact JSON with sorted
+    keys and non-ASCII kept, server-maintained fields left out.
+    Clients compute the same hash for POST /sync/manifest.
+    """
+    content = {k: v for k, v in record.items() if k not in SERVER_FIELDS}
+    body = json.dumps(content, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+async def upsert_records(
+    kind: str,
+    records: List[dict],
+    schema: Type[BaseModel],
+    get_hashes: Callable[[List[str]], Awaitable[Dict[str, Optional[str]]]],
+    save_batch: Callable[[List[dict]], Awaitable[List[str]]]
+) -> List[SyncRecordResult]:
+    """
+    Validate records one by one, skip those whose content hash matches
+    the stored row, then upsert the rest in chunks of SYNC_BATCH_SIZE
+    with at most SYNC_CONCURRENCY chunks in flight.
+    A chunk that fails with a transient database error is retried as is,
+    up to SYNC_RETRIES times with backoff. A chunk rejected for its data
+    is split in half and retried until the bad records are isolated, so
+    each record gets its own accepted/rejected result.
+    """
+    results: List[SyncRecordResult] = []
+    valid: List[dict] = []
+    for record in records:
+        try:
+            row = schema.model_validate(record).model_dump()
+            row["content_hash"] = content_hash(record)
+            valid.append(row)
+        except ValidationError as e:
+            record_id = record.get("id") if isinstance(record, dict) else None
+            results.append(SyncRecordResult(
+                type=kind, id=str(record_id) if record_id is not None else None,
+                accepted=False, error=f"Invalid record: {e.errors()[0]['msg']}"
+            ))
+
+    # Unchanged records are accepted without a write
+    stored = await get_hashes([r["id"] for r in valid]) if valid else {}
+    changed = []
+    for row in valid:
+        if stored.get(row["id"]) == row["content_hash"]:
+            results.append(SyncRecordResult(type=kind, id=row["id"], accepted=True, unchanged=True))
+        else:
+            changed.append(row)
+    metrics.inc("sync_records_unchanged", len(valid) - len(changed))
+
+    semaphore = asyncio.Semaphore(settings.SYNC_CONCURRENCY)
+
+    async def save(chunk: List[dict]) -> List[SyncRecordResult]:
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    with metrics.timer("sync_chunk_seconds"):
+                        saved = set(await save_batch(chunk))
+                break
+            except DatabaseTimeout:
+                # The call may still complete; the client retries the sync
+                raise
+            except DatabaseUnavailable:
+                # Nothing wrong with the records, so splitting would not help
+                if attempt >= settings.SYNC_RETRIES:
+                    raise
+                metrics.inc("sync_chunk_retries")
+                await asyncio.sleep(settings.SYNC_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+                attempt += 1
+            except Exception:
+                if len(chunk) == 1:
+                    # Driver errors can include SQL and row values; keep them in the log
+                    logger.exception("Sync upsert of %s %s failed", kind, chunk[0]["id"])
+                    return [SyncRecordResult(type=kind, id=chunk[0]["id"], accepted=False, error="storage error")]
+                middle = len(chunk) // 2
+                halves = await asyncio.gather(save(chunk[:middle]), save(chunk[middle:]))
+                return halves[0] + halves[1]
+        return [
+            SyncRecordResult(
+                type=kind, id=r["id"], accepted=r["id"] in saved,
+                error=None if r["id"] in saved else "Record belongs to another user"
+            )
+            for r in chunk
+        ]
+
+    size = max(1, settings.SYNC_BATCH_SIZE)
+    chunks = [changed[i:i + size] for i in range(0, len(changed), size)]
+    for chunk_results in await asyncio.gather(*(save(chunk) for chunk in chunks)):
+        results.extend(chunk_results)
+    return results
+
+
+@router.post("/sync/manifest", response_model=SyncManifestResponse)
+async def sync_manifest(
+    manifest: SyncManifest,
+    user: dict = Depends(require_user),
+    db: Database = Depends(get_db)
+):
+    """
+    First step of a sync: the client sends (id, hash) for its local
+    records and gets back the ids whose content the server does not
+    have. Only those records need to be sent to POST /sync.
+    """
+    if max(len(manifest.quiz_sessions), len(manifest.wrong_answers)) > MAX_MANIFEST_SIZE:
+        raise HTTPException(status_code=400, detail=f"Too many records, maximum is {MAX_MANIFEST_SIZE}")
+    await db.flush_wrong_answers(user["id"])
+
+    async def needed(table: str, entries: List[SyncManifestEntry]) -> List[str]:
+        if not entries:
+            return []
+        stored = await db.get_content_hashes(user["id"], table, [e.id for e in entries])
+        return [e.id for e in entries if stored.get(e.id) != e.hash]
+
+    with metrics.timer("progress_sync_manifest_seconds"):
+        sessions, wrong_answers = await asyncio.gather(
+            needed("quiz_sessions", manifest.quiz_sessions),
+            needed("wrong_answers", manifest.wrong_answers)
+        )
+    return SyncManifestResponse(quiz_sessions=sessions, wrong_answers=wrong_answers)
+
+
 @router.post("/sync", response_model=SyncResponse)
 async def sync_data(
     data: SyncData,
@@ -87,66 +244,92 @@ async def sync_data(
     """
     Sync data between frontend and backend.
 
-    Frontend sends local data, backend merges and returns updated data.
-    Uses last_sync_at to determine which data is newer.
+    Frontend sends local data, backend upserts it and reports for every
+    record whether it was accepted or rejected (and why).
     """
-    synced_sessions = 0
-    synced_wrong = 0
-
-    # Sync quiz sessions
-    if data.quiz_sessions:
-        synced_sessions = await db.save_sessions_batch(
-            user["id"],
-            [s.model_dump() for s in data.quiz_sessions]
-        )
-
-    # Sync wrong answers
-    if data.wrong_answers:
-        synced_wrong = await db.save_wrong_answers_batch(
-            user["id"],
-            [w.model_dump() for w in data.wrong_answers]
-        )
+    user_id = user["id"]
+    # Buffered updates must not land after (and overwrite) synced records
+    await db.flush_wrong_answers(user_id)
+    # Tables are written one after the other: both writes adjust the same
+    # user_stats rows, which the Supabase backend updates read-modify-write
+    session_results = await upsert_records(
+        "quiz_session", data.quiz_sessions, QuizSessionCreate,
+        lambda ids: db.get_content_hashes(user_id, "quiz_sessions", ids),
+        lambda chunk: db.save_sessions_batch(user_id, chunk)
+    )
+    wrong_results = await upsert_records(
+        "wrong_answer", data.wrong_answers, WrongAnswerCreate,
+        lambda ids: db.get_content_hashes(user_id, "wrong_answers", ids),
+        lambda chunk: db.save_wrong_answers_batch(user_id, chunk)
+    )
 
+    results = session_results + wrong_results
+    rejected = sum(1 for r in results if not r.accepted)
     return SyncResponse(
-        success=True,
-        message="Sync completed",
+        success=rejected == 0,
+        message="Sync completed" if not rejected else f"Sync completed, {rejected} records rejected",
         synced_at=datetime.utcnow(),
         stats={
-            "sessions": synced_sessions,
-            "wrong_answers": synced_wrong
-        }
+            "sessions": sum(1 for r in session_results if r.accepted),
+            "wrong_answers": sum(1 for r in wrong_results if r.accepted),
+            "unchanged": sum(1 for r in results if r.unchanged),
+            "rejected": rejected
+        },
+        results=results
     )
 
 
 @router.get("/sync")
 async def get_sync_data(
     since: Optional[datetime] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_SYNC_PAGE_SIZE),
+    sessions_cursor: Optional[str] = None,
+    wrong_answers_cursor: Optional[str] = None,
     user: dict = Depends(require_user),
     db: Database = Depends(get_db)
 ):
     """
-    Get all user data for sync.
-    Optionally filter by last sync time.
-    """
-    sessions = await db.get_user_sessions(user["id"])
-    wrong_answers = await db.get_user_wrong_answers(user["id"])
+    Get user data changed since the last sync.
+
+    - since: return only rows the server updated after this time
+    - limit: page size per table; follow next_sessions_cursor and
+      next_wrong_answers_cursor (null when done) to get the rest
+    Use synced_at of the first page as the next since.
 
-    # Filter by sync time if provided
+    Rows are stamped when their transaction starts, not when it commits,
+    so rows from SYNC_SINCE_OVERLAP_SECONDS before since are returned
+    again; clients apply rows by id, so the repeats are harmless.
+    """
+    await db.flush_wrong_answers(user["id"])
+    sessions_after = decode_cursor(sessions_cursor)
+    wrong_answers_after = decode_cursor(wrong_answers_cursor)
     if since:
-        sessions = [s for s in sessions if s.get("start_time", "") > since.isoformat()]
-        wrong_answers = [w for w in wrong_answers if w.get("last_wrong_at", "") > since.isoformat()]
+        since -= timedelta(seconds=settings.SYNC_SINCE_OVERLAP_SECONDS)
+    synced_at = datetime.utcnow()
+    with metrics.timer("progress_sync_read_seconds"):
+        sessions, wrong_answers = await asyncio.gather(
+            db.get_sessions_changed(user["id"], since, sessions_after, limit),
+            db.get_wrong_answers_changed(user["id"], since, wrong_answers_after, limit)
+        )
 
     return {
         "quiz_sessions": sessions,
         "wrong_answers": wrong_answers,
-        "synced_at": datetime.utcnow().isoformat()
+        "next_sessions_cursor": encode_cursor(sessions[-1]) if limit and len(sessions) == limit else None,
+        "next_wrong_answers_cursor": (
+            encode_cursor(wrong_answers[-1]) if limit and len(wrong_answers) == limit else None
+        ),
+        "synced_at": synced_at.isoformat()
     }
 
 
 @router.get("/stats")
 async def get_stats(
+    exam_id: Optional[str] = None,
     user: dict = Depends(require_user),
     db: Database = Depends(get_db)
 ):
-    """Get user statistics"""
-    return await db.get_user_stats(user["id"])
+    """Get user statistics, overall or for one exam"""
+    await db.flush_wrong_answers(user["id"])
+    with metrics.timer("progress_stats_seconds"):
+        return await db.get_user_stats(user["id"], exam_id)
@@ -1,88 +1,27 @@
 """
 Video generation router - Generate explanation videos for questions
 """
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import FileResponse
-from typing import Optional
+from typing import List, Optional
 import os
 import uuid
 from datetime import datetime
 
 from models.schemas import VideoRequest, VideoJob, VideoStatus
+from services.video_jobs import job_store
+from services.video_worker import estimate_wait
 from config import settings
+from metrics import metrics
 
 router = APIRouter()
 
-# In-memory job storage (use Redis in production)
-video_jobs: dict[str, VideoJob] = {}
-
-
-async def generate_video_task(job_id: str, request: VideoRequest, app_state):
-    """Background task to generate video"""
-    job = video_jobs[job_id]
-
-    try:
-        from services.video_composer import VideoComposer
-
-        job.status = VideoStatus.processing
-        job.message = "Initializing..."
-
-        # Get question data
-        from routers.exams import get_exam
-        exam_data = await get_exam(request.exam_id)
-        questions = exam_data.get("questions", [])
-
-        # Filter requested questions
-        selected_questions = [
-            q for q in questions
-            if q["id"] in request.question_ids
-        ]
-
-        if not selected_questions:
-            raise Exception("No questions found")
-
-        # Initialize video composer
-        composer = VideoComposer(
-            renderer=app_state.renderer,
-            language=request.language
-        )
-
-        total = len(selected_questions)
-        for i, question in enumerate(selected_questions):
-            job.progress = (i / total) * 100
-            job.message = f"Processing question {i + 1}/{total}"
-
-            await composer.add_question(
-                question,
-                include_explanation=request.include_explanation
-            )
-
-        job.message = "Composing final video..."
-        output_path = os.path.join(
-            settings.VIDEO_OUTPUT_DIR,
-            f"{job_id}.mp4"
-        )
-        await composer.compose(output_path)
-
-        job.status = VideoStatus.completed
-        job.progress = 100
-        job.video_url = f"/api/video/download/{job_id}"
-        job.message = "Video ready!"
-
-    except Exception as e:
-        job.status = VideoStatus.failed
-        job.message = str(e)
-
 
 @router.post("/generate", response_model=VideoJob)
-async def generate_video(
-    request: VideoRequest,
-    background_tasks: BackgroundTasks,
-    req: Request
-):
+async def generate_video(request: VideoRequest):
     """
-    Start video generation job.
-    Returns job ID to check progress.
+    Queue a video generation job for the video workers.
+    Returns job ID to check progress, or 429 when the queue is full.
     """
     job_id = str(uuid.uuid4())
 
@@ -93,34 +32,42 @@ async def generate_video(
         message="Job queued",
         created_at=datetime.utcnow()
     )
-    video_jobs[job_id] = job
-
-    # Start background task
-    background_tasks.add_task(
-        generate_video_task,
-        job_id,
-        request,
-        req.app.state
-    )
+    if not await job_store.create(job, request, max_pending=settings.VIDEO_QUEUE_SIZE):
+        metrics.inc("video_jobs_rejected")
+        position = await job_store.count(VideoStatus.pending) + 1
+        wait = await estimate_wait(position)
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "message": "Video queue is full, try again later",
+                "queue_position": position,
+                "estimated_wait_seconds": wait
+            },
+            headers={"Retry-After": str(await estimate_wait(1))}
+        )
 
+    job.queue_position = await job_store.queue_position(job_id)
     return job
 
 
 @router.get("/status/{job_id}", response_model=VideoJob)
 async def get_job_status(job_id: str):
     """Get video generation job status"""
-    if job_id not in video_jobs:
+    job = await job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    return video_jobs[job_id]
+    if job.status == VideoStatus.pending:
+        job.queue_position = await job_store.queue_position(job_id)
+    return job
 
 
 @router.get("/download/{job_id}")
 async def download_video(job_id: str):
     """Download generated video"""
-    if job_id not in video_jobs:
+    job = await job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    job = video_jobs[job_id]
     if job.status != VideoStatus.completed:
         raise HTTPException(status_code=400, detail="Video not ready")
 
@@ -138,8 +85,7 @@ async def download_video(job_id: str):
 @router.delete("/job/{job_id}")
 async def delete_job(job_id: str):
     """Delete a job and its video file"""
-    if job_id in video_jobs:
-        del video_jobs[job_id]
+    await job_store.delete(job_id)
 
     filepath = os.path.join(settings.VIDEO_OUTPUT_DIR, f"{job_id}.mp4")
     if os.path.exists(filepath):
@@ -148,7 +94,10 @@ async def delete_job(job_id: str):
     return {"message": "Job deleted"}
 
 
-@router.get("/jobs")
-async def list_jobs():
-    """List all video jobs"""
-    return list(video_jobs.values())
+@router.get("/jobs", response_model=List[VideoJob])
+async def list_jobs(
+    status: Optional[VideoStatus] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """List video jobs, newest first"""
+    return await job_store.list(status, limit)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Rebuild the maintained per-user progress stats from scratch.
+
+Stats are updated incrementally on every write; run this after a schema
+change, a bulk import or to repair drift.
+
+Usage:
+    python scripts/rebuild_user_stats.py [user_id ...]
+"""
+
+import asyncio
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.database import db
+from models.user_stats import ALL_EXAMS, format_stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rebuild per-user progress stats")
+    parser.add_argument("user_ids", nargs="*", help="Users to rebuild (default: all users)")
+    args = parser.parse_args()
+
+    if not db.connect():
+        print("Database not configured")
+        sys.exit(1)
+    await db.startup()
+
+    try:
+        user_ids = args.user_ids or await db.list_user_ids()
+        for i, user_id in enumerate(user_ids, 1):
+            stats = await db.rebuild_user_stats(user_id)
+            print(f"[{i}/{len(user_ids)}] {user_id}: {format_stats(stats.get(ALL_EXAMS))}")
+    finally:
+        await db.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
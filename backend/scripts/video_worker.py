@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Run video generation workers outside the API.
+
+Use with VIDEO_WORKERS=0 on the API to run the workers separately (e.g.
+in their own container or under a process supervisor). Workers share
+the job store (VIDEO_JOB_STORE_URL) with the API.
+
+Usage:
+    python scripts/video_worker.py [--processes N] [--jobs N]
+"""
+
+import asyncio
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+from services.video_worker import serve, start_worker_processes, stop_worker_processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run video generation workers")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes (default: 1)")
+    parser.add_argument("--jobs", type=int, default=settings.VIDEO_JOBS_PER_WORKER,
+                        help=f"Concurrent jobs per process (default: {settings.VIDEO_JOBS_PER_WORKER})")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        asyncio.run(serve(args.jobs))
+        return
+
+    processes = start_worker_processes(args.processes, args.jobs)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_worker_processes(processes)
+
+
+if __name__ == "__main__":
+    main()
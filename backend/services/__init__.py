@@ -1,3 +1,18 @@
-from .tts_engine import TTSEngine
-from .slide_renderer import SlideRenderer
-from .video_composer import VideoComposer
+# Exports are resolved on first use so that light modules such as
+# services.exam_format can be imported without edge-tts, Playwright or MoviePy
+_EXPORTS = {
+    "TTSEngine": ".tts_engine",
+    "SlideRenderer": ".slide_renderer",
+    "VideoComposer": ".video_composer",
+    "ExamCatalog": ".exam_catalog",
+}
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    return getattr(import_module(_EXPORTS[name], __name__), name)
+
+
+__all__ = list(_EXPORTS)
@@ -0,0 +1,102 @@
+"""
+Adaptive Limiter - AIMD concurrency limit for calls to an external service
+
+The limit grows by about one per round of successful, fast calls
+(additive increase) and halves when a call fails or takes longer than
+the latency target (multiplicative decrease), at most once per latency
+target interval. Throughput rises until the service starts to push back,
+then settles just below that point. Cancelled calls (e.g. a stopped job)
+free their slot without changing the limit.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque
+
+from metrics import metrics
+
+
+class AdaptiveLimiter:
+    """Concurrency limit adjusted from observed latency and errors"""
+
+    def __init__(
+        self,
+        name: str,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        latency_target: float,
+        decrease_factor: float = 0.5
+    ):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.limit = float(min(max(initial, minimum), maximum))
+        self._inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Hold a slot for one call; the call's outcome adjusts the limit"""
+        await self._wait_for_slot()
+        start = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            # The caller gave up; this says nothing about the service
+            self._free()
+            raise
+        except BaseException:
+            self._release(False, time.monotonic() - start)
+            raise
+        self._release(True, time.monotonic() - start)
+
+    async def _wait_for_slot(self):
+        while self._inflight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Woken but not taking the slot: pass it on
+                    self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self._inflight += 1
+        self._report()
+
+    def _release(self, ok: bool, latency: float):
+        metrics.observe(f"{self.name}_call_seconds", latency)
+        if ok and latency <= self.latency_target:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        else:
+            metrics.inc(f"{self.name}_{'slow_calls' if ok else 'failed_calls'}")
+            now = time.monotonic()
+            if now - self._last_decrease >= self.latency_target:
+                self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                self._last_decrease = now
+        self._free()
+
+    def _free(self):
+        self._inflight -= 1
+        self._report()
+        self._wake()
+
+    def _wake(self):
+        free = int(self.limit) - self._inflight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _report(self):
+        metrics.set_gauge(f"{self.name}_concurrency_limit", round(self.limit, 2))
+        metrics.set_gauge(f"{self.name}_inflight", self._inflight)
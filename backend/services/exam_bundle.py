@@ -0,0 +1,132 @@
+"""
+Exam Bundle - Memory-mapped reader for the packed exam bundle
+
+The bundle is written by scripts/build_exam_bundle.py. Opening it maps
+the file and reads the header and exam table only. Each exam file is
+stored once, as it was on disk, and the question table holds the byte
+span of every question inside it: questions are decoded from the
+mapped file on demand, whole-file responses are byte-identical to the
+files, and every worker shares the same page-cache copy of the bank.
+"""
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from .exam_format import (
+    MAGIC, VERSION, HEADER, STRING_ENTRY, EXAM_ENTRY, QUESTION_ENTRY, EXAM_QUARANTINED
+)
+
+
+class BundleExam(NamedTuple):
+    """An exam table entry"""
+    filename: str
+    mtime_ns: int
+    size: int
+    exam: Optional[dict]
+    header_json: str  # Exam header as stored, or the parse error
+    error: Optional[str]
+    first_question: int
+    question_count: int
+    questions_start: int  # Span of the questions array body in the files section
+    questions_end: int
+    file_start: int
+    file_end: int
+
+
+class ExamBundle:
+    """Read-only view of a packed exam bundle"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        st = os.stat(path)
+        self.mtime_ns = st.st_mtime_ns
+
+        (magic, version, _flags, exam_count, self.question_count,
+         strings_offset, exams_offset, questions_offset,
+         self._files_offset) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Unsupported exam bundle: {path}")
+
+        self._strings_offset = strings_offset + 4
+        string_count, = struct.unpack_from("<I", self._mm, strings_offset)
+        self._string_data = self._strings_offset + string_count * STRING_ENTRY.size
+        self._questions_offset = questions_offset
+
+        self.exams: Dict[str, BundleExam] = {}
+        for i in range(exam_count):
+            (filename_idx, header_idx, flags, first_question, question_count,
+             questions_start, questions_end, mtime_ns, size,
+             file_start, file_end) = EXAM_ENTRY.unpack_from(
+                self._mm, exams_offset + i * EXAM_ENTRY.size
+            )
+            header = self._string(header_idx)
+            quarantined = flags & EXAM_QUARANTINED
+            filename = self._string(filename_idx)
+            self.exams[filename] = BundleExam(
+                filename=filename,
+                mtime_ns=mtime_ns,
+                size=size,
+                exam=None if quarantined else json.loads(header),
+                header_json=header,
+                error=header if quarantined else None,
+                first_question=first_question,
+                question_count=question_count,
+                questions_start=questions_start,
+                questions_end=questions_end,
+                file_start=file_start,
+                file_end=file_end
+            )
+
+        self._positions: Dict[str, Dict[str, int]] = {}
+
+    def _string(self, idx: int) -> str:
+        offset, length = STRING_ENTRY.unpack_from(
+            self._mm, self._strings_offset + idx * STRING_ENTRY.size
+        )
+        start = self._string_data + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _question_entry(self, number: int):
+        return QUESTION_ENTRY.unpack_from(
+            self._mm, self._questions_offset + number * QUESTION_ENTRY.size
+        )
+
+    def _span(self, start: int, end: int) -> bytes:
+        return self._mm[self._files_offset + start:self._files_offset + end]
+
+    def __iter__(self) -> Iterator[BundleExam]:
+        return iter(self.exams.values())
+
+    def exam_bytes(self, filename: str) -> bytes:
+        """The exam file exactly as it was packed"""
+        entry = self.exams[filename]
+        return self._span(entry.file_start, entry.file_end)
+
+    def questions(self, filename: str) -> List[dict]:
+        """Decode all questions of an exam"""
+        entry = self.exams[filename]
+        return json.loads(b"[" + self._span(entry.questions_start, entry.questions_end) + b"]")
+
+    def get_question(self, filename: str, question_id: str) -> Optional[dict]:
+        """Decode a single question without touching the rest of the exam"""
+        entry = self.exams.get(filename)
+        if not entry:
+            return None
+
+        positions = self._positions.get(filename)
+        if positions is None:
+            positions = {}
+            for i in range(entry.question_count):
+                id_idx = self._question_entry(entry.first_question + i)[0]
+                positions.setdefault(self._string(id_idx), entry.first_question + i)
+            self._positions[filename] = positions
+
+        number = positions.get(question_id)
+        if number is None:
+            return None
+        _id_idx, _domain_idx, offset, length = self._question_entry(number)
+        return json.loads(self._span(offset, offset + length))
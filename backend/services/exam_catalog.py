@@ -0,0 +1,678 @@
+"""
+Exam Catalog - In-memory index of the exam JSON files
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from config import settings
+from metrics import metrics
+from .exam_bundle import ExamBundle
+from .exam_format import exam_header
+from .json_payload import JSONPayload
+from .quiz_sampler import QuizSampler
+from .question_search import SearchIndex, SearchShard, SearchHit
+
+# Path to exam data files
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static", "sample-data")
+
+# Separates a namespace from the exam id, e.g. "middle-school:middle-school-math-1"
+NAMESPACE_SEPARATOR = ":"
+
+
+def namespace_of(filename: str) -> str:
+    """Namespace of an exam file: its directory relative to the data directory"""
+    return os.path.dirname(filename)
+
+
+def namespaced(filename: str, exam: dict) -> dict:
+    """
+    Qualify the id of an exam in a subdirectory with its namespace.
+    Top-level exams keep their plain ids.
+    """
+    namespace = namespace_of(filename)
+    if not namespace:
+        return exam
+    return {
+        **exam,
+        "id": f"{namespace}{NAMESPACE_SEPARATOR}{exam['id']}",
+        "namespace": namespace
+    }
+
+
+def qualify_question(exam: dict, question):
+    """Give a question of a namespaced exam the exam's namespaced examId"""
+    if not exam.get("namespace") or not isinstance(question, dict) or "examId" not in question:
+        return question
+    return {**question, "examId": exam["id"]}
+
+
+def qualify_exam(exam: dict, data):
+    """
+    Give a parsed file of a namespaced exam its catalog header, so the
+    served exam and its questions carry the same id as the listing.
+    Top-level exams are returned unchanged.
+    """
+    if not exam.get("namespace") or not isinstance(data, dict):
+        return data
+    data = {**data, "exam": exam}
+    if isinstance(data.get("questions"), list):
+        data["questions"] = [qualify_question(exam, q) for q in data["questions"]]
+    return data
+
+
+class CatalogEntry(NamedTuple):
+    """A parsed exam file and the stat info it was parsed from"""
+    filename: str
+    mtime_ns: int
+    size: int
+    exam: Optional[dict]  # None when the file has no usable exam header
+    error: Optional[str] = None  # Parse error of a quarantined file
+    shard: Optional[SearchShard] = None  # Search index of the file's questions
+
+
+class QuestionView:
+    """A projection of an exam's questions onto a set of fields"""
+
+    def __init__(self, items: List[dict]):
+        self.items = items
+        self._payload: Optional[JSONPayload] = None
+
+    @property
+    def payload(self) -> JSONPayload:
+        """Pre-serialized list of all projected questions"""
+        if self._payload is None:
+            self._payload = JSONPayload.from_data(self.items)
+        return self._payload
+
+
+class ExamRecord:
+    """
+    A loaded exam with a question_id -> question index.
+
+    The raw file bytes double as the pre-serialized exam payload, so
+    whole-exam responses never parse the file. Exams in a namespace are
+    the exception: their payload is re-serialized with the namespaced ids
+    (see qualify_exam()), and only file_payload is the file as is. The
+    questions are parsed on first use; question lists are projected and
+    serialized on first use per field set and then reused.
+    """
+
+    # Projected views kept per record, oldest dropped first
+    MAX_VIEWS = 8
+
+    def __init__(self, entry: CatalogEntry, raw: bytes):
+        self.entry = entry
+        self.file_payload = JSONPayload(raw)
+        self._payload: Optional[JSONPayload] = None
+        self._data: Optional[dict] = None
+        self._question_index: Optional[Dict[str, dict]] = None
+        self._positions: Optional[Dict[str, int]] = None
+        self._views: Dict[Tuple[str, ...], QuestionView] = {}
+        self._sampler: Optional[QuizSampler] = None
+
+    @property
+    def payload(self) -> JSONPayload:
+        """Pre-serialized exam as served by the API"""
+        if self._payload is None:
+            if self.entry.exam.get("namespace"):
+                self._payload = JSONPayload.from_data(self.data)
+            else:
+                self._payload = self.file_payload
+        return self._payload
+
+    @property
+    def data(self) -> dict:
+        """The parsed exam file with namespaced ids, parsed on first use"""
+        if self._data is None:
+            self._data = qualify_exam(self.entry.exam, json.loads(self.file_payload.body))
+        return self._data
+
+    @property
+    def questions(self) -> List[dict]:
+        return self.data.get("questions", [])
+
+    @property
+    def question_index(self) -> Dict[str, dict]:
+        if self._question_index is None:
+            self._question_index = {str(q.get("id")): q for q in self.questions}
+        return self._question_index
+
+    @property
+    def positions(self) -> Dict[str, int]:
+        """question_id -> position in questions"""
+        if self._positions is None:
+            self._positions = {str(q.get("id")): i for i, q in enumerate(self.questions)}
+        return self._positions
+
+    @property
+    def questions_payload(self) -> JSONPayload:
+        """Pre-serialized list of all questions"""
+        return self.view().payload
+
+    @property
+    def sampler(self) -> QuizSampler:
+        """Per-domain question arrays for quiz sampling, built on first use"""
+        if self._sampler is None:
+            self._sampler = QuizSampler(self.questions)
+        return self._sampler
+
+    def view(self, fields: Tuple[str, ...] = ()) -> QuestionView:
+        """
+        Get the questions projected onto fields (all fields when empty).
+        Views are cached per field set.
+        """
+        view = self._views.get(fields)
+        if view is None:
+            if fields:
+                items = [
+                    {f: q[f] for f in fields if f in q}
+                    for q in self.questions
+                ]
+            else:
+                items = self.questions
+            view = QuestionView(items)
+            if len(self._views) >= self.MAX_VIEWS:
+                self._views.pop(next(iter(self._views)))
+            self._views[fields] = view
+        return view
+
+    def get_question(self, question_id: str) -> Optional[dict]:
+        """Get a question by ID"""
+        return self.question_index.get(question_id)
+
+
+class _CatalogIndex:
+    """Immutable lookup tables derived from a set of catalog entries"""
+
+    def __init__(self, entries: Dict[str, CatalogEntry]):
+        self.entries = entries  # filename -> entry
+        self.files: Dict[str, str] = {}  # exam_id -> filename
+        self.headers: Dict[str, dict] = {}  # exam_id -> exam header
+        self.by_language: Dict[str, List[dict]] = {}
+        self.by_namespace: Dict[str, List[dict]] = {}
+        self.quarantine: List[CatalogEntry] = []
+
+        for filename in sorted(entries):
+            if entries[filename].error:
+                self.quarantine.append(entries[filename])
+                continue
+            exam = entries[filename].exam
+            if not exam:
+                continue
+            exam_id = exam["id"]
+            if exam_id in self.files:
+                print(f"Duplicate exam id {exam_id} in {filename}, keeping {self.files[exam_id]}")
+                continue
+            self.files[exam_id] = filename
+            self.headers[exam_id] = exam
+            self.by_language.setdefault(exam.get("language"), []).append(exam)
+            self.by_namespace.setdefault(exam.get("namespace", ""), []).append(exam)
+
+        self.exams: List[dict] = list(self.headers.values())
+        self.search = SearchIndex([
+            entries[filename].shard for filename in self.files.values()
+            if entries[filename].shard
+        ])
+
+
+class ExamCatalog:
+    """
+    Index of exam files, built once at startup.
+
+    Holds the exam_id -> file map, the exam headers and per-language
+    lists so that lookups never touch the data directory. refresh()
+    re-parses only files whose mtime or size changed and swaps in a new
+    index in a single assignment, so readers never see a partial index.
+
+    The data directory is walked recursively. Exams in a subdirectory
+    belong to that directory's namespace and their ids are prefixed with
+    it (see namespaced()), so sets in different directories cannot collide.
+    Served exams and questions carry the prefixed id too (see qualify_exam()).
+
+    Each file's questions are tokenized into a search shard when the file
+    is parsed, so the full-text index is rebuilt incrementally too.
+
+    Loaded exams are kept in a bounded LRU of ExamRecord objects. A record
+    is only reused while its file's catalog entry is unchanged.
+
+    When bundle_path points to a bundle built by scripts/build_exam_bundle.py
+    the catalog is served from the memory-mapped bundle instead: startup
+    only reads its exam table, questions are decoded on demand and search
+    shards are built afterwards by build_search_shards().
+
+    Async handlers use the fetch_* methods, which read and parse files on
+    a small dedicated thread pool and let concurrent requests for the same
+    file share one load.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = DATA_DIR,
+        cache_size: int = settings.EXAM_CACHE_SIZE,
+        bundle_path: str = settings.EXAM_BUNDLE_PATH,
+        io_workers: int = settings.EXAM_IO_WORKERS
+    ):
+        self.data_dir = data_dir
+        self.cache_size = cache_size
+        self.bundle_path = bundle_path
+        self.bundle: Optional[ExamBundle] = None
+        self._index = _CatalogIndex({})
+        self._lock = threading.Lock()
+        self._records: "OrderedDict[str, ExamRecord]" = OrderedDict()
+        self._records_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="exam-io")
+        self._loading: Dict[Tuple[str, int, int], Future] = {}
+        self._closed = threading.Event()
+
+    @property
+    def files(self) -> Dict[str, str]:
+        return self._index.files
+
+    @property
+    def headers(self) -> Dict[str, dict]:
+        return self._index.headers
+
+    @property
+    def exams(self) -> List[dict]:
+        return self._index.exams
+
+    @property
+    def by_language(self) -> Dict[str, List[dict]]:
+        return self._index.by_language
+
+    def build(self) -> int:
+        """
+        Scan the data directory and index every exam file.
+
+        Returns:
+            Number of indexed exams
+        """
+        start = time.perf_counter()
+        with self._lock:
+            if self.bundle_path and os.path.exists(self.bundle_path):
+                self._apply_bundle({})
+            else:
+                if self.bundle_path:
+                    print(f"Exam bundle {self.bundle_path} not found, indexing {self.data_dir}")
+                self.bundle = None
+                self._apply(self._scan(), {})
+        metrics.set_gauge("exam_catalog_build_seconds", round(time.perf_counter() - start, 6))
+        metrics.set_gauge("exam_catalog_exams", len(self._index.files))
+        return len(self._index.files)
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        Re-index files that were added, changed or deleted since the last scan.
+
+        Returns:
+            Counts of added, changed and removed files
+        """
+        with self._lock:
+            if self.bundle:
+                try:
+                    mtime_ns = os.stat(self.bundle_path).st_mtime_ns
+                except OSError:
+                    return {"added": 0, "changed": 0, "removed": 0}
+                if mtime_ns == self.bundle.mtime_ns:
+                    return {"added": 0, "changed": 0, "removed": 0}
+                changes = self._apply_bundle(self._index.entries)
+            else:
+                return self._apply(self._scan(), self._index.entries)
+        self.build_search_shards()
+        return changes
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Stat every JSON file under the data directory in one recursive walk.
+        Files are keyed by their path relative to data_dir ("/"-separated).
+        """
+        stats: Dict[str, Tuple[int, int]] = {}
+        if not os.path.isdir(self.data_dir):
+            return stats
+
+        pending = [""]
+        while pending:
+            subdir = pending.pop()
+            with os.scandir(os.path.join(self.data_dir, subdir)) as it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    name = f"{subdir}/{entry.name}" if subdir else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(name)
+                    elif entry.name.endswith(".json") and entry.is_file():
+                        st = entry.stat()
+                        stats[name] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def _apply(
+        self,
+        stats: Dict[str, Tuple[int, int]],
+        current: Dict[str, CatalogEntry]
+    ) -> Dict[str, int]:
+        """Parse new or modified files and swap in the resulting index"""
+        entries: Dict[str, CatalogEntry] = {}
+        added = changed = 0
+
+        for filename, (mtime_ns, size) in stats.items():
+            old = current.get(filename)
+            if old and old.mtime_ns == mtime_ns and old.size == size:
+                entries[filename] = old
+                continue
+
+            if old:
+                changed += 1
+            else:
+                added += 1
+
+            entries[filename] = self._parse(filename, mtime_ns, size)
+
+        removed = len(current.keys() - stats.keys())
+
+        if added or changed or removed or not current:
+            self._index = _CatalogIndex(entries)
+
+        return {"added": added, "changed": changed, "removed": removed}
+
+    def _apply_bundle(self, current: Dict[str, CatalogEntry]) -> Dict[str, int]:
+        """Map the bundle and swap in an index of its exam table"""
+        bundle = ExamBundle(self.bundle_path)
+        entries: Dict[str, CatalogEntry] = {}
+        added = changed = 0
+
+        for item in bundle:
+            old = current.get(item.filename)
+            if old and old.mtime_ns == item.mtime_ns and old.size == item.size:
+                entries[item.filename] = old
+                continue
+
+            if old:
+                changed += 1
+            else:
+                added += 1
+
+            if item.error:
+                print(f"Quarantined {item.filename}: {item.error}")
+            exam = namespaced(item.filename, item.exam) if item.exam else None
+            entries[item.filename] = CatalogEntry(
+                item.filename, item.mtime_ns, item.size, exam, item.error
+            )
+
+        removed = len(current.keys() - entries.keys())
+
+        self.bundle = bundle
+        self._index = _CatalogIndex(entries)
+        return {"added": added, "changed": changed, "removed": removed}
+
+    def build_search_shards(self) -> int:
+        """
+        Build the search shards that are still missing.
+        Only needed for bundle-backed catalogs, where questions are not
+        decoded at startup.
+
+        Returns:
+            Number of shards built
+        """
+        with self._lock:
+            bundle = self.bundle
+            index = self._index
+            if not bundle:
+                return 0
+
+            entries = dict(index.entries)
+            built = 0
+            for filename in index.files.values():
+                if self._closed.is_set():
+                    break
+                entry = entries[filename]
+                if entry.shard is None:
+                    shard = SearchShard(entry.exam, bundle.questions(filename))
+                    entries[filename] = entry._replace(shard=shard)
+                    built += 1
+
+            if built:
+                self._index = _CatalogIndex(entries)
+        return built
+
+    def close(self):
+        """Stop background work; a running build_search_shards() stops after its current shard"""
+        self._closed.set()
+        self._executor.shutdown(wait=False)
+
+    @property
+    def search_ready(self) -> bool:
+        """Whether every indexed exam has a search shard"""
+        index = self._index
+        return len(index.search.shards) == len(index.files)
+
+    def _parse(self, filename: str, mtime_ns: int, size: int) -> CatalogEntry:
+        """
+        Parse a file's exam header into a catalog entry.
+        Unreadable files are quarantined with their error and are not
+        re-parsed until their mtime or size changes.
+        """
+        try:
+            data = self._read(filename)
+        except Exception as e:
+            print(f"Quarantined {filename}: {e}")
+            return CatalogEntry(filename, mtime_ns, size, None, str(e))
+
+        exam = exam_header(filename, data)
+        if not exam:
+            return CatalogEntry(filename, mtime_ns, size, None)
+
+        exam = namespaced(filename, exam)
+        shard = SearchShard(exam, data.get("questions", []))
+        return CatalogEntry(filename, mtime_ns, size, exam, shard=shard)
+
+    def _read(self, filename: str) -> dict:
+        """Parse a single exam file"""
+        return json.loads(self._read_bytes(filename))
+
+    def _read_bytes(self, filename: str) -> bytes:
+        """Read the raw contents of an exam file"""
+        bundle = self.bundle
+        if bundle:
+            if filename not in bundle.exams:
+                raise FileNotFoundError(filename)
+            return bundle.exam_bytes(filename)
+
+        with open(os.path.join(self.data_dir, filename), "rb") as f:
+            return f.read()
+
+    async def watch(self, interval: float):
+        """Poll the data directory (or bundle) and refresh the catalog when files change"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                changes = await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"Exam catalog refresh failed: {e}")
+                continue
+            if any(changes.values()):
+                print(f"Exam catalog reloaded: {changes}")
+
+    def list_exams(
+        self,
+        language: Optional[str] = None,
+        namespace: Optional[str] = None,
+        provider: Optional[str] = None
+    ) -> List[dict]:
+        """List exam headers, optionally filtered by language, namespace and provider"""
+        index = self._index
+        if namespace is not None:
+            exams = index.by_namespace.get(namespace, [])
+            if language:
+                exams = [e for e in exams if e.get("language") == language]
+        elif language:
+            exams = index.by_language.get(language, [])
+        else:
+            exams = index.exams
+        if provider:
+            exams = [e for e in exams if e.get("provider") == provider]
+        return exams
+
+    def list_namespaces(self) -> Dict[str, int]:
+        """Number of exams per namespace"""
+        return {ns: len(exams) for ns, exams in self._index.by_namespace.items()}
+
+    def list_quarantine(self) -> List[CatalogEntry]:
+        """List files that failed to parse"""
+        return self._index.quarantine
+
+    def search(
+        self,
+        query: str,
+        language: Optional[str] = None,
+        exam_id: Optional[str] = None,
+        domain: Optional[str] = None,
+        limit: int = 20
+    ) -> List[SearchHit]:
+        """Ranked full-text search over all indexed questions"""
+        return self._index.search.search(query, language, exam_id, domain, limit)
+
+    def get_header(self, exam_id: str) -> Optional[dict]:
+        """Get exam header by ID"""
+        return self._index.headers.get(exam_id)
+
+    def get_record(self, exam_id: str) -> Optional[ExamRecord]:
+        """Get the loaded exam record by ID, reading the file on a cache miss"""
+        index = self._index
+        filename = index.files.get(exam_id)
+        if not filename:
+            return None
+        return self._get_record(index.entries[filename])
+
+    def get_record_by_filename(self, filename: str) -> Optional[ExamRecord]:
+        """Get the loaded exam record for an indexed exam file"""
+        index = self._index
+        entry = index.entries.get(filename)
+        if not entry or not entry.exam or index.files.get(entry.exam["id"]) != filename:
+            return None
+        return self._get_record(entry)
+
+    def _get_record(self, entry: CatalogEntry) -> ExamRecord:
+        """Get a cached record for an entry or load it from disk"""
+        return self._cached(entry) or self._load(entry)
+
+    def _cached(self, entry: CatalogEntry) -> Optional[ExamRecord]:
+        """Get the cached record for an entry if it is still current"""
+        with self._records_lock:
+            record = self._records.get(entry.filename)
+            if record and record.entry is entry:
+                self._records.move_to_end(entry.filename)
+                metrics.inc("exam_cache_hits")
+                return record
+        return None
+
+    def _load(self, entry: CatalogEntry) -> ExamRecord:
+        """Read and parse an exam file and add it to the cache"""
+        filename = entry.filename
+        with metrics.timer("exam_load_seconds"):
+            record = ExamRecord(entry, self._read_bytes(filename))
+        metrics.inc("exam_cache_misses")
+
+        with self._records_lock:
+            self._records[filename] = record
+            self._records.move_to_end(filename)
+            while len(self._records) > self.cache_size:
+                self._records.popitem(last=False)
+        return record
+
+    async def _fetch(self, entry: CatalogEntry) -> ExamRecord:
+        """
+        Get a record without blocking the event loop.
+        Concurrent fetches of the same file version wait on a single load.
+        """
+        record = self._cached(entry)
+        if record:
+            return record
+
+        key = (entry.filename, entry.mtime_ns, entry.size)
+        future = self._loading.get(key)
+        if future is None:
+            future = self._executor.submit(self._load, entry)
+            self._loading[key] = future
+            metrics.set_gauge("exam_loads_in_flight", len(self._loading))
+            future.add_done_callback(lambda f: self._loaded(key, f))
+        else:
+            metrics.inc("exam_loads_coalesced")
+
+        # Shield so one cancelled request doesn't cancel the shared load
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def _loaded(self, key: Tuple[str, int, int], future: Future):
+        """Forget a finished load (runs on the I/O thread)"""
+        if self._loading.get(key) is future:
+            del self._loading[key]
+        metrics.set_gauge("exam_loads_in_flight", len(self._loading))
+
+    async def fetch_record(self, exam_id: str) -> Optional[ExamRecord]:
+        """Async get_record: loads on the exam I/O pool on a cache miss"""
+        index = self._index
+        filename = index.files.get(exam_id)
+        if not filename:
+            return None
+        return await self._fetch(index.entries[filename])
+
+    async def fetch_record_by_filename(self, filename: str) -> Optional[ExamRecord]:
+        """Async get_record_by_filename"""
+        index = self._index
+        entry = index.entries.get(filename)
+        if not entry or not entry.exam or index.files.get(entry.exam["id"]) != filename:
+            return None
+        return await self._fetch(entry)
+
+    async def fetch_question(self, exam_id: str, question_id: str) -> Optional[dict]:
+        """Async get_question"""
+        index = self._index
+        filename = index.files.get(exam_id)
+        if not filename:
+            return None
+        entry = index.entries[filename]
+
+        # Single questions decode from the mapped bundle cheaply enough to stay inline
+        bundle = self.bundle
+        if bundle and filename in bundle.exams and not self._cached(entry):
+            return qualify_question(entry.exam, bundle.get_question(filename, question_id))
+
+        record = await self._fetch(entry)
+        return record.get_question(question_id)
+
+    def load_exam(self, exam_id: str) -> Optional[dict]:
+        """Load the full exam data (header and questions) by ID"""
+        record = self.get_record(exam_id)
+        return record.data if record else None
+
+    def get_question(self, exam_id: str, question_id: str) -> Optional[dict]:
+        """Get a single question by exam and question ID"""
+        index = self._index
+        filename = index.files.get(exam_id)
+        if not filename:
+            return None
+        entry = index.entries[filename]
+
+        # Decode just the one question from the bundle unless the exam is loaded
+        bundle = self.bundle
+        if bundle and filename in bundle.exams:
+            with self._records_lock:
+                record = self._records.get(filename)
+            if not record or record.entry is not entry:
+                return qualify_question(entry.exam, bundle.get_question(filename, question_id))
+
+        return self._get_record(entry).get_question(question_id)
+
+
+# Global catalog instance
+catalog = ExamCatalog()
+
+
+def get_catalog() -> ExamCatalog:
+    """Dependency to get the exam catalog"""
+    return catalog
@@ -0,0 +1,42 @@
+"""
+Exam Format - Exam file headers and the packed bundle layout
+
+Shared by the backend and scripts/build_exam_bundle.py, so it must only
+use the standard library.
+"""
+import os
+import struct
+from typing import Optional
+
+MAGIC = b"SFEB"
+VERSION = 3
+
+HEADER = struct.Struct("<4sHHIIQQQQ")
+STRING_ENTRY = struct.Struct("<II")
+EXAM_ENTRY = struct.Struct("<IIIIIQQqQQQ")
+QUESTION_ENTRY = struct.Struct("<IIQI")
+
+EXAM_QUARANTINED = 1
+
+
+def exam_header(filename: str, data) -> Optional[dict]:
+    """
+    Get the exam header of a parsed exam file.
+
+    Accepts {"exam": {...}, "questions": [...]} and the flat
+    {"examId", "title", ..., "questions"} layout. Flat files share one
+    examId across the sets of a certification, so they are identified by
+    their file name instead.
+    """
+    if not isinstance(data, dict):
+        return None
+    exam = data.get("exam")
+    if exam is None and data.get("examId"):
+        exam_id = os.path.splitext(os.path.basename(filename))[0]
+        exam = {"id": exam_id, "name": data.get("title", exam_id)}
+        for key in ("examId", "description", "totalQuestions", "language", "provider"):
+            if key in data:
+                exam[key] = data[key]
+    if not isinstance(exam, dict) or not exam.get("id"):
+        return None
+    return exam
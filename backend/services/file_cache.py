@@ -0,0 +1,239 @@
+"""
+File Cache - Content-addressed disk cache for generated media
+
+Generated files (speech audio, slide images) are stored under a hash of
+everything that determines their content, so each is produced once and
+reused by every later job, worker process and script on the host. Files
+are written to a temporary name and renamed into place, so readers never
+see a partial file. The least recently used files are evicted when a
+cache exceeds its size limit.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from metrics import metrics
+
+# Evict down to this fraction of the limit, so eviction does not run on every write
+EVICT_TO = 0.9
+
+
+class FillNotShared(Exception):
+    """The fill of a key was cancelled or not cacheable; waiters on it should retry"""
+
+
+def content_key(*parts: Any) -> str:
+    """SHA-256 of JSON-serializable parts"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class FileCache:
+    """
+    Disk cache of files shared by all processes using a directory.
+
+    Files live at <directory>/<key[:2]>/<key><suffix>; their mtime is the
+    last use and drives LRU eviction. Concurrent misses on one key in a
+    process share a single fill. Hits, misses, hit rate, evictions and
+    size are reported in metrics as <name>_cache_*.
+    """
+
+    def __init__(self, name: str, directory: str, max_bytes: int, suffix: str):
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._size: Optional[int] = None
+        self._size_lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._hits = 0
+        self._lookups = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}{self.suffix}")
+
+    def _count(self, hit: bool):
+        self._lookups += 1
+        self._hits += hit
+        metrics.inc(f"{self.name}_cache_{'hits' if hit else 'misses'}")
+        metrics.set_gauge(f"{self.name}_cache_hit_rate", round(self._hits / self._lookups, 4))
+
+    async def fetch(
+        self,
+        key: str,
+        output_path: str,
+        fill: Callable[[str], Awaitable[object]]
+    ) -> str:
+        """
+        Put the file for key at output_path, calling fill(path) to
+        create it on a miss. A fill that returns False made a file that
+        must not be reused (e.g. a slide drawn with a fallback font): it
+        goes to output_path only.
+        """
+        if not self.enabled:
+            await fill(output_path)
+            return output_path
+
+        cached = self.path(key)
+        hit = await asyncio.to_thread(self._use, cached, output_path)
+        self._count(hit)
+        if hit:
+            return output_path
+
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                if not await self._fill(key, cached, output_path, fill):
+                    return output_path
+                break
+            try:
+                await asyncio.shield(future)
+                break
+            except FillNotShared:
+                # Nothing was cached for us to use: fill it ourselves
+                continue
+
+        if not await asyncio.to_thread(self._use, cached, output_path):
+            # Evicted before it could be used: fill without the cache
+            await fill(output_path)
+        return output_path
+
+    async def _fill(
+        self,
+        key: str,
+        cached: str,
+        output_path: str,
+        fill: Callable[[str], Awaitable[object]]
+    ) -> bool:
+        """
+        Fill a key, sharing the outcome with concurrent fetches of it.
+        Returns False when the fill was not cacheable and went to output_path.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            stored = await self._store(cached, output_path, fill)
+            if stored:
+                future.set_result(None)
+            else:
+                future.set_exception(FillNotShared(key))
+                future.exception()  # Do not warn when there are no waiters
+            return stored
+        except asyncio.CancelledError:
+            # Waiters were not cancelled; let them retry instead
+            future.set_exception(FillNotShared(key))
+            future.exception()  # Do not warn when there are no waiters
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Waiters re-raise it; do not warn when there are none
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _store(self, cached: str, output_path: str, fill: Callable[[str], Awaitable[object]]) -> bool:
+        """
+        Fill a temporary file and move it into the cache atomically, or
+        to output_path when the fill says it is not cacheable.
+        """
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        temporary = f"{cached}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        try:
+            with metrics.timer(f"{self.name}_cache_fill_seconds"):
+                cacheable = await fill(temporary) is not False
+            if not cacheable:
+                metrics.inc(f"{self.name}_cache_uncacheable")
+                directory = os.path.dirname(output_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                os.replace(temporary, output_path)
+                return False
+            size = os.path.getsize(temporary)
+            os.replace(temporary, cached)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        await asyncio.to_thread(self._grow, size)
+        return True
+
+    def _use(self, cached: str, output_path: str) -> bool:
+        """Mark a cached file as used and link or copy it to output_path"""
+        try:
+            os.utime(cached)
+        except FileNotFoundError:
+            return False
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.lexists(output_path):
+            os.remove(output_path)
+        try:
+            os.link(cached, output_path)
+        except FileNotFoundError:
+            # Evicted by another process just now
+            return False
+        except OSError:
+            # Different filesystem or no hard links
+            try:
+                shutil.copyfile(cached, output_path)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def _scan(self) -> list:
+        """(mtime, size, path) of every cached file"""
+        files = []
+        if not os.path.isdir(self.directory):
+            return files
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(self.suffix):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _grow(self, added: int):
+        """Account for a new file and evict when over the limit"""
+        with self._size_lock:
+            if self._size is None:
+                # Include files written by earlier runs and other processes
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += added
+            if self._size > self.max_bytes:
+                self._evict()
+            metrics.set_gauge(f"{self.name}_cache_bytes", self._size)
+
+    def _evict(self):
+        """Delete least recently used files down to EVICT_TO of the limit"""
+        start = time.perf_counter()
+        files = sorted(self._scan())
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in files:
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        self._size = total
+        metrics.inc(f"{self.name}_cache_evictions", evicted)
+        metrics.observe(f"{self.name}_cache_evict_seconds", time.perf_counter() - start)
@@ -0,0 +1,133 @@
+"""
+JSON Payload - Pre-serialized, precompressed response bodies with ETags
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+
+class JSONPayload:
+    """
+    A JSON body serialized once.
+
+    Keeps the raw bytes, a strong content-hash ETag and lazily built gzip
+    and brotli variants, so serving it never re-runs json.dumps or
+    recompresses the body.
+    """
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self._encoded: Dict[str, bytes] = {}
+
+    @classmethod
+    def from_data(cls, data: Any) -> "JSONPayload":
+        """Serialize data to a compact UTF-8 JSON payload"""
+        return cls(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    def encoded(self, encoding: str) -> bytes:
+        """Get the body compressed with the given encoding (br or gzip)"""
+        body = self._encoded.get(encoding)
+        if body is None:
+            if encoding == "br":
+                body = brotli.compress(self.body, quality=9)
+            else:
+                body = gzip.compress(self.body, compresslevel=6, mtime=0)
+            self._encoded[encoding] = body
+        return body
+
+    def body_for(self, encoding: Optional[str]) -> bytes:
+        """Get the body for a negotiated encoding (None for identity)"""
+        return self.encoded(encoding) if encoding else self.body
+
+    async def body_for_async(self, encoding: Optional[str]) -> bytes:
+        """body_for that compresses a variant off the event loop the first time"""
+        if not encoding or encoding in self._encoded:
+            return self.body_for(encoding)
+        return await asyncio.get_running_loop().run_in_executor(None, self.encoded, encoding)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported encoding for an Accept-Encoding header"""
+    accepted = _parse_accept_encoding(accept_encoding)
+    if brotli and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _parse_accept_encoding(header: str) -> set:
+    """Return the codings accepted with a non-zero q-value"""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    if "*" in accepted:
+        accepted.update(("br", "gzip"))
+    return accepted
+
+
+def _variant_etag(etag: str, encoding: Optional[str]) -> str:
+    """ETag of an encoded variant; each content coding gets its own tag"""
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against any variant of an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    variants = {etag, _variant_etag(etag, "gzip"), _variant_etag(etag, "br")}
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in variants:
+            return True
+    return False
+
+
+async def payload_response(
+    request: Request,
+    payload: JSONPayload,
+    filename: Optional[str] = None
+) -> Response:
+    """
+    Build a response for a payload.
+    Answers 304 when If-None-Match matches, otherwise sends the
+    precompressed variant chosen by Accept-Encoding.
+    """
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    headers = {"ETag": _variant_etag(payload.etag, encoding), "Vary": "Accept-Encoding"}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    if _etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    body = await payload.body_for_async(encoding)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -8,12 +8,15 @@ from moviepy.editor import (
 )
 from playwright.async_api import async_playwright, Browser, Page
 from jinja2 import Environment, FileSystemLoader
-import edge_tts
 import os
 import json
 import asyncio
 from typing import List, Dict, Any, Optional
 
+from .slide_cache import fonts_loaded, slide_cache, slide_key
+from .tts_cache import cache_key, tts_cache
+from .tts_engine import save_speech
+
 # Configuration
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output")
 SLIDES_DIR = os.path.join(OUTPUT_DIR, "kids_slides")
@@ -66,6 +69,8 @@ THEME_COLORS = {
     }
 }
 
+VIEWPORT = {"width": 1920, "height": 1080}
+
 MASCOTS = ["🤖", "🐱", "🐶", "🦊", "🐻", "🐼"]
 
 
@@ -94,7 +99,7 @@ class KidsSlideRenderer:
             args=['--no-sandbox', '--disable-dev-shm-usage']
         )
         self.page = await self.browser.new_page(
-            viewport={"width": 1920, "height": 1080}
+            viewport=VIEWPORT
         )
 
     async def close_browser(self):
@@ -106,6 +111,23 @@ class KidsSlideRenderer:
         self.browser = None
         self.page = None
 
+    async def _screenshot(self, html: str, output_path: str) -> str:
+        """Save a screenshot of html, rendering it only on a slide cache miss"""
+        async def render(path: str):
+            if not self.page:
+                await self.init_browser()
+
+            await self.page.set_content(html)
+            fonts_ok = await fonts_loaded(self.page)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            await self.page.screenshot(path=path, type="png")
+            # Drawn with a fallback font: use it for this job but do not cache it
+            return fonts_ok
+
+        key = slide_key(html, VIEWPORT, full_page=False)
+        return await slide_cache.fetch(key, output_path, render)
+
     async def render_intro(
         self,
         lesson_number: int,
@@ -116,9 +138,6 @@ class KidsSlideRenderer:
         language: str = "zh-CN"
     ) -> str:
         """Render lesson intro slide"""
-        if not self.page:
-            await self.init_browser()
-
         template = self.env.get_template("intro.html")
 
         # Localized text
@@ -137,12 +156,7 @@ class KidsSlideRenderer:
             duration=duration_text
         )
 
-        await self.page.set_content(html)
-        await self.page.wait_for_timeout(200)
-
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        await self.page.screenshot(path=output_path)
-        return output_path
+        return await self._screenshot(html, output_path)
 
     async def render_content(
         self,
@@ -157,9 +171,6 @@ class KidsSlideRenderer:
         language: str = "zh-CN"
     ) -> str:
         """Render content slide"""
-        if not self.page:
-            await self.init_browser()
-
         template = self.env.get_template("content.html")
         theme = THEME_COLORS.get(lesson_type, THEME_COLORS["ai-intro"])
 
@@ -182,12 +193,7 @@ class KidsSlideRenderer:
             **theme
         )
 
-        await self.page.set_content(html)
-        await self.page.wait_for_timeout(200)
-
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        await self.page.screenshot(path=output_path)
-        return output_path
+        return await self._screenshot(html, output_path)
 
     async def render_quiz(
         self,
@@ -200,9 +206,6 @@ class KidsSlideRenderer:
         language: str = "zh-CN"
     ) -> str:
         """Render quiz slide"""
-        if not self.page:
-            await self.init_browser()
-
         template = self.env.get_template("quiz.html")
 
         # Process options with status
@@ -230,12 +233,7 @@ class KidsSlideRenderer:
             options=processed_options
         )
 
-        await self.page.set_content(html)
-        await self.page.wait_for_timeout(200)
-
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        await self.page.screenshot(path=output_path)
-        return output_path
+        return await self._screenshot(html, output_path)
 
     async def render_celebration(
         self,
@@ -247,9 +245,6 @@ class KidsSlideRenderer:
         language: str = "zh-CN"
     ) -> str:
         """Render celebration slide"""
-        if not self.page:
-            await self.init_browser()
-
         template = self.env.get_template("celebration.html")
 
         # Localized text
@@ -270,12 +265,7 @@ class KidsSlideRenderer:
             next_label=next_label
         )
 
-        await self.page.set_content(html)
-        await self.page.wait_for_timeout(200)
-
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        await self.page.screenshot(path=output_path)
-        return output_path
+        return await self._screenshot(html, output_path)
 
 
 class KidsTTSEngine:
@@ -290,14 +280,10 @@ class KidsTTSEngine:
         """Generate audio from text"""
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-        communicate = edge_tts.Communicate(
-            text,
-            self.voice,
-            rate=self.rate
-        )
+        async def generate(path: str):
+            await save_speech(text, self.voice, path, rate=self.rate)
 
-        await communicate.save(output_path)
-        return output_path
+        return await tts_cache.fetch(cache_key(text, self.voice, self.rate), output_path, generate)
 
 
 class KidsVideoGenerator:
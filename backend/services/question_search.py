@@ -0,0 +1,203 @@
+"""
+Question Search - In-memory inverted index over the question bank
+
+Chinese and Japanese text is tokenized into character bigrams, other
+text into lowercase words. Each exam file gets its own shard so that a
+catalog reload only rebuilds the shards of changed files.
+"""
+import heapq
+import math
+import re
+import sys
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+# Runs of CJK ideographs, kana and Hangul, or of latin letters and digits
+_TOKEN_RE = re.compile(
+    r"(?P<cjk>[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+)"
+    r"|(?P<word>[0-9a-z\u00c0-\u024f]+)"
+)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+SNIPPET_RADIUS = 40
+
+# A posting packs (doc << 8) | min(tf, 255); single-doc terms store the
+# int directly, others an array of them
+Postings = Union[int, array]
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into word tokens and CJK character bigrams"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        run = match.group()
+        if match.lastgroup == "cjk" and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def _question_text(question: dict) -> str:
+    """
+    Searchable text of a question: stem, options and tags.
+    Explanations are left out; they roughly double the index size.
+    """
+    parts = [str(question.get("question", ""))]
+    options = question.get("options")
+    if isinstance(options, dict):
+        parts.extend(str(v) for v in options.values())
+    tags = question.get("tags")
+    if isinstance(tags, list):
+        parts.extend(str(t) for t in tags)
+    return "\n".join(parts)
+
+
+def _iter_postings(postings: Postings):
+    """Yield (doc, tf) pairs of a posting entry"""
+    if isinstance(postings, int):
+        yield postings >> 8, postings & 0xFF
+    else:
+        for p in postings:
+            yield p >> 8, p & 0xFF
+
+
+def _doc_freq(postings: Optional[Postings]) -> int:
+    if postings is None:
+        return 0
+    return 1 if isinstance(postings, int) else len(postings)
+
+
+class SearchHit:
+    """A ranked search result"""
+
+    __slots__ = ("exam_id", "question_id", "domain", "score", "snippet")
+
+    def __init__(self, exam_id: str, question_id: str, domain, score: float, snippet: str):
+        self.exam_id = exam_id
+        self.question_id = question_id
+        self.domain = domain
+        self.score = score
+        self.snippet = snippet
+
+
+class SearchShard:
+    """Inverted index of the questions of one exam file"""
+
+    def __init__(self, exam: dict, questions: Iterable[dict]):
+        self.exam_id: str = exam["id"]
+        self.language: Optional[str] = exam.get("language")
+        self.question_ids: List[str] = []
+        self.domains: List[str] = []
+        self.texts: List[str] = []  # Question stems, used for snippets
+        self.lengths: List[int] = []
+        self.postings: Dict[str, Postings] = {}
+
+        postings = self.postings
+        for doc, question in enumerate(questions):
+            self.question_ids.append(str(question.get("id")))
+            self.domains.append(str(question.get("domain")))
+            self.texts.append(str(question.get("question", "")))
+
+            tokens = tokenize(_question_text(question))
+            self.lengths.append(len(tokens))
+            for token, tf in Counter(tokens).items():
+                posting = (doc << 8) | min(tf, 0xFF)
+                current = postings.get(token)
+                if current is None:
+                    # Interning shares token strings across shards
+                    postings[sys.intern(token)] = posting
+                elif isinstance(current, int):
+                    postings[token] = array("I", (current, posting))
+                else:
+                    current.append(posting)
+
+        self.total_length = sum(self.lengths)
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+
+class SearchIndex:
+    """Ranked top-k search across a set of shards"""
+
+    def __init__(self, shards: List[SearchShard]):
+        self.shards = shards
+        self.doc_count = sum(len(s) for s in shards)
+        total_length = sum(s.total_length for s in shards)
+        self.avg_length = total_length / self.doc_count if self.doc_count else 0.0
+
+    def search(
+        self,
+        query: str,
+        language: Optional[str] = None,
+        exam_id: Optional[str] = None,
+        domain: Optional[str] = None,
+        limit: int = 20
+    ) -> List[SearchHit]:
+        """Return the top questions for a query, best first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_count:
+            return []
+
+        # Document frequencies over the whole bank
+        idf: Dict[str, float] = {}
+        for term in terms:
+            df = sum(_doc_freq(s.postings.get(term)) for s in self.shards)
+            if df:
+                idf[term] = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+        if not idf:
+            return []
+
+        candidates: List[Tuple[float, int, int]] = []
+        for shard_no, shard in enumerate(self.shards):
+            if language and shard.language != language:
+                continue
+            if exam_id and shard.exam_id != exam_id:
+                continue
+
+            scores: Dict[int, float] = {}
+            for term, weight in idf.items():
+                postings = shard.postings.get(term)
+                if postings is None:
+                    continue
+                for doc, tf in _iter_postings(postings):
+                    if domain is not None and shard.domains[doc] != domain:
+                        continue
+                    norm = K1 * (1 - B + B * shard.lengths[doc] / self.avg_length)
+                    scores[doc] = scores.get(doc, 0.0) + weight * tf * (K1 + 1) / (tf + norm)
+
+            candidates.extend((score, shard_no, doc) for doc, score in scores.items())
+
+        hits = []
+        for score, shard_no, doc in heapq.nlargest(limit, candidates):
+            shard = self.shards[shard_no]
+            hits.append(SearchHit(
+                exam_id=shard.exam_id,
+                question_id=shard.question_ids[doc],
+                domain=shard.domains[doc],
+                score=round(score, 4),
+                snippet=make_snippet(shard.texts[doc], terms)
+            ))
+        return hits
+
+
+def make_snippet(text: str, terms: List[str]) -> str:
+    """Cut a window of text around the first matching term"""
+    lowered = text.lower()
+    positions = [p for p in (lowered.find(t) for t in terms) if p >= 0]
+    if not positions:
+        return text[:SNIPPET_RADIUS * 2]
+
+    start = max(0, min(positions) - SNIPPET_RADIUS)
+    end = min(len(text), start + SNIPPET_RADIUS * 2)
+    snippet = text[start:end]
+    if start > 0:
+        snippet = "…" + snippet
+    if end < len(text):
+        snippet = snippet + "…"
+    return snippet
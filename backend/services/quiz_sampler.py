@@ -0,0 +1,117 @@
+"""
+Quiz Sampler - Domain-weighted random question sets for practice and mock exams
+"""
+import random
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def default_weights(exam: dict) -> Dict[str, float]:
+    """Domain weights from the exam header's domains[].weight, keyed like question domains"""
+    weights = {}
+    for domain in exam.get("domains") or []:
+        if not isinstance(domain, dict):
+            continue
+        weight = domain.get("weight")
+        if domain.get("id") is not None and isinstance(weight, (int, float)) and weight > 0:
+            weights[str(domain["id"])] = float(weight)
+    return weights
+
+
+def allocate(count: int, weights: Dict[str, float], available: Dict[str, int]) -> Dict[str, int]:
+    """
+    Split count across domains in proportion to weights (largest remainder),
+    never taking more than a domain has. A shortfall in one domain is
+    spread over the others by the same rule.
+    """
+    allocation = {domain: 0 for domain in weights}
+    open_domains = [d for d, w in weights.items() if w > 0 and available.get(d, 0) > 0]
+    remaining = count
+
+    while remaining > 0 and open_domains:
+        total = sum(weights[d] for d in open_domains)
+        shares = {d: remaining * weights[d] / total for d in open_domains}
+        grants = {d: int(shares[d]) for d in open_domains}
+        leftover = remaining - sum(grants.values())
+        for d in sorted(open_domains, key=lambda d: shares[d] - grants[d], reverse=True)[:leftover]:
+            grants[d] += 1
+
+        for d in open_domains:
+            granted = min(grants[d], available[d] - allocation[d])
+            allocation[d] += granted
+            remaining -= granted
+        open_domains = [d for d in open_domains if allocation[d] < available[d]]
+
+    return {d: n for d, n in allocation.items() if n}
+
+
+class QuizSampler:
+    """
+    Per-domain, per-difficulty arrays of question positions for one exam.
+
+    Built once per loaded exam; sample() then draws k questions in O(k)
+    without scanning or copying the question list.
+    """
+
+    def __init__(self, questions: Iterable[dict]):
+        # domain -> difficulty -> question positions
+        self.pools: Dict[str, Dict[Optional[str], List[int]]] = {}
+        for position, question in enumerate(questions):
+            domain = str(question.get("domain"))
+            difficulty = question.get("difficulty")
+            self.pools.setdefault(domain, {}).setdefault(difficulty, []).append(position)
+
+    def _domain_pools(
+        self,
+        domain: str,
+        difficulties: Optional[Tuple[str, ...]]
+    ) -> List[List[int]]:
+        by_difficulty = self.pools.get(domain, {})
+        if difficulties is None:
+            return list(by_difficulty.values())
+        return [by_difficulty[d] for d in difficulties if d in by_difficulty]
+
+    def available(self, difficulties: Optional[Tuple[str, ...]] = None) -> Dict[str, int]:
+        """Number of questions per domain matching the difficulty filter"""
+        counts = {}
+        for domain in self.pools:
+            n = sum(len(pool) for pool in self._domain_pools(domain, difficulties))
+            if n:
+                counts[domain] = n
+        return counts
+
+    def sample(
+        self,
+        count: int,
+        weights: Optional[Dict[str, float]] = None,
+        difficulties: Optional[Tuple[str, ...]] = None,
+        seed: Optional[int] = None
+    ) -> Tuple[List[int], Dict[str, int]]:
+        """
+        Draw up to count question positions, shuffled.
+
+        weights maps domain -> weight; when empty, domains are weighted by
+        their number of matching questions. Returns the positions and the
+        number drawn per domain.
+        """
+        rng = random.Random(seed)
+        available = self.available(difficulties)
+        if not weights:
+            weights = {d: float(n) for d, n in available.items()}
+        allocation = allocate(count, weights, available)
+
+        positions: List[int] = []
+        for domain, k in allocation.items():
+            pools = self._domain_pools(domain, difficulties)
+            # Sample from the concatenated pools without building it
+            offsets = []
+            total = 0
+            for pool in pools:
+                offsets.append(total)
+                total += len(pool)
+            for i in rng.sample(range(total), k):
+                p = bisect_right(offsets, i) - 1
+                positions.append(pools[p][i - offsets[p]])
+
+        rng.shuffle(positions)
+        return positions, allocation
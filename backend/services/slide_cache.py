@@ -0,0 +1,48 @@
+"""
+Slide Cache - Rendered slide images keyed by page content and viewport
+
+The key covers the rendered HTML (template source plus render context),
+the viewport, the screenshot options and the Playwright version, so a
+slide is rendered through Chromium once and reused by every later job
+(see services/file_cache.py). Slides drawn while a web font failed to
+load are used once and not cached, so a network hiccup does not leave
+fallback-font slides in the cache.
+"""
+from importlib.metadata import version
+from typing import Dict
+
+from config import settings
+from .file_cache import FileCache, content_key
+
+# Bump to invalidate every cached slide (e.g. after changing fonts)
+CACHE_FORMAT = 2
+
+ENGINE_VERSION = f"playwright/{version('playwright')}/{CACHE_FORMAT}"
+
+# Waits for the page's fonts; false when a web font failed to load. A web
+# font stylesheet that failed to load declares no font faces at all.
+FONTS_LOADED_JS = """
+async () => {
+    await document.fonts.ready;
+    const faces = [...document.fonts];
+    if (faces.some(face => face.status === "error")) return false;
+    const css = [...document.querySelectorAll("style")].map(node => node.textContent).join("\\n");
+    const wantsWebFonts = /@import|@font-face/.test(css) ||
+        document.querySelector("link[rel=stylesheet]") !== null;
+    return !wantsWebFonts || faces.some(face => face.status === "loaded");
+}
+"""
+
+
+def slide_key(html: str, viewport: Dict[str, int], **screenshot_options) -> str:
+    """Hash identifying one rendered slide"""
+    return content_key(ENGINE_VERSION, viewport, screenshot_options, html)
+
+
+async def fonts_loaded(page) -> bool:
+    """Wait for a page's fonts; False when the slide would use a fallback font"""
+    return await page.evaluate(FONTS_LOADED_JS)
+
+
+# Global slide cache instance
+slide_cache = FileCache("slide", settings.SLIDE_CACHE_DIR, settings.SLIDE_CACHE_MAX_MB * 1024 * 1024, ".png")
@@ -4,10 +4,14 @@ Renders HTML templates to images for video slides
 """
 from playwright.async_api import async_playwright, Browser, Page
 from jinja2 import Environment, FileSystemLoader
+import asyncio
 import os
 from typing import Optional, Dict, Any
 
 from config import settings
+from .slide_cache import fonts_loaded, slide_cache, slide_key
+
+VIEWPORT = {"width": 1920, "height": 1080}
 
 
 class SlideRenderer:
@@ -16,6 +20,7 @@ class SlideRenderer:
     def __init__(self):
         self.browser: Optional[Browser] = None
         self.page: Optional[Page] = None
+        self._lock = asyncio.Lock()
 
         # Setup Jinja2 templates
         template_dir = os.path.join(
@@ -248,7 +253,7 @@ class SlideRenderer:
             args=['--no-sandbox', '--disable-dev-shm-usage']
         )
         self.page = await self.browser.new_page(
-            viewport={"width": 1920, "height": 1080}
+            viewport=VIEWPORT
         )
 
     async def close_browser(self):
@@ -260,6 +265,25 @@ class SlideRenderer:
         self.browser = None
         self.page = None
 
+    async def _screenshot(self, html: str, output_path: str) -> str:
+        """Save a screenshot of html, rendering it only on a slide cache miss"""
+        async def render(path: str):
+            # Jobs running concurrently in one worker share the page
+            async with self._lock:
+                if not self.page:
+                    await self.init_browser()
+
+                await self.page.set_content(html)
+                fonts_ok = await fonts_loaded(self.page)
+
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                await self.page.screenshot(path=path, type="png", full_page=True)
+            # Drawn with a fallback font: use it for this job but do not cache it
+            return fonts_ok
+
+        key = slide_key(html, VIEWPORT, full_page=True)
+        return await slide_cache.fetch(key, output_path, render)
+
     async def render_question(
         self,
         question: Dict[str, Any],
@@ -270,9 +294,6 @@ class SlideRenderer:
         exam_name: str = ""
     ) -> str:
         """Render question slide to image"""
-        if not self.page:
-            await self.init_browser()
-
         # Prepare data
         answer = question.get("answer", "")
         if isinstance(answer, str):
@@ -301,14 +322,7 @@ class SlideRenderer:
             footer_text=footer_text
         )
 
-        # Save HTML and screenshot
-        await self.page.set_content(html)
-        await self.page.wait_for_timeout(100)  # Wait for fonts
-
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        await self.page.screenshot(path=output_path, full_page=True)
-
-        return output_path
+        return await self._screenshot(html, output_path)
 
     async def render_explanation(
         self,
@@ -317,9 +331,6 @@ class SlideRenderer:
         language: str = "zh-CN"
     ) -> str:
         """Render explanation slide to image"""
-        if not self.page:
-            await self.init_browser()
-
         # Prepare data
         answer = question.get("answer", "")
         if isinstance(answer, list):
@@ -345,11 +356,4 @@ class SlideRenderer:
             footer_text=footer_text
         )
 
-        # Save HTML and screenshot
-        await self.page.set_content(html)
-        await self.page.wait_for_timeout(100)
-
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        await self.page.screenshot(path=output_path, full_page=True)
-
-        return output_path
+        return await self._screenshot(html, output_path)
@@ -0,0 +1,24 @@
+"""
+TTS Cache - Synthesized speech keyed by text, voice, rate and engine version
+
+A sentence is synthesized once and reused by every later job, worker
+process and script on the host (see services/file_cache.py).
+"""
+import edge_tts
+
+from config import settings
+from .file_cache import FileCache, content_key
+
+# Bump to invalidate every cached file (e.g. after changing audio settings)
+CACHE_FORMAT = 1
+
+ENGINE_VERSION = f"edge-tts/{edge_tts.__version__}/{CACHE_FORMAT}"
+
+
+def cache_key(text: str, voice: str, rate: str, kind: str = "text") -> str:
+    """Hash identifying one synthesized audio; kind separates text from SSML"""
+    return content_key(ENGINE_VERSION, kind, voice, rate, text)
+
+
+# Global TTS cache instance
+tts_cache = FileCache("tts", settings.TTS_CACHE_DIR, settings.TTS_CACHE_MAX_MB * 1024 * 1024, ".mp3")
@@ -4,9 +4,44 @@ TTS Engine using edge-tts (Microsoft Edge's free TTS)
 import edge_tts
 import os
 import asyncio
+import random
 from typing import Optional
 
 from config import settings
+from metrics import metrics
+from .adaptive_limiter import AdaptiveLimiter
+from .tts_cache import cache_key, tts_cache
+
+# Concurrent edge-tts calls in this process, adapted to latency and errors
+tts_limiter = AdaptiveLimiter(
+    "tts",
+    initial=settings.TTS_CONCURRENCY_INITIAL,
+    minimum=settings.TTS_CONCURRENCY_MIN,
+    maximum=settings.TTS_CONCURRENCY_MAX,
+    latency_target=settings.TTS_LATENCY_TARGET_SECONDS
+)
+
+
+async def save_speech(text: str, voice: str, output_path: str, rate: str = "+0%"):
+    """
+    Synthesize text (or SSML) with edge-tts into output_path.
+    Calls go through tts_limiter; failures are retried with jittered
+    exponential backoff up to TTS_MAX_RETRIES times.
+    """
+    for attempt in range(settings.TTS_MAX_RETRIES + 1):
+        try:
+            async with tts_limiter.acquire():
+                communicate = edge_tts.Communicate(text, voice, rate=rate)
+                await communicate.save(output_path)
+            return
+        except Exception as e:
+            if attempt == settings.TTS_MAX_RETRIES:
+                metrics.inc("tts_failures")
+                raise
+            delay = random.uniform(0, settings.TTS_RETRY_BASE_SECONDS * 2 ** attempt)
+            metrics.inc("tts_retries")
+            print(f"TTS attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
 
 
 class TTSEngine:
@@ -66,15 +101,11 @@ class TTSEngine:
         # Create output directory if needed
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-        # Generate audio
-        communicate = edge_tts.Communicate(
-            text,
-            self.voice,
-            rate=rate
-        )
+        async def generate(path: str):
+            await save_speech(text, self.voice, path, rate=rate)
 
-        await communicate.save(output_path)
-        return output_path
+        # Reuse audio synthesized earlier for the same text, voice and rate
+        return await tts_cache.fetch(cache_key(text, self.voice, rate), output_path, generate)
 
     async def synthesize_ssml(
         self,
@@ -87,9 +118,10 @@ class TTSEngine:
         """
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-        communicate = edge_tts.Communicate(ssml, self.voice)
-        await communicate.save(output_path)
-        return output_path
+        async def generate(path: str):
+            await save_speech(ssml, self.voice, path)
+
+        return await tts_cache.fetch(cache_key(ssml, self.voice, "", kind="ssml"), output_path, generate)
 
     async def get_duration(self, audio_path: str) -> float:
         """Get duration of audio file in seconds"""
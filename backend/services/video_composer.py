@@ -6,6 +6,7 @@ from moviepy.editor import (
     CompositeVideoClip, TextClip
 )
 import os
+from contextlib import nullcontext
 from typing import List, Dict, Any, Optional
 import asyncio
 
@@ -21,14 +22,72 @@ class VideoComposer:
         self,
         renderer: SlideRenderer,
         language: str = "zh-CN",
-        voice: Optional[str] = None
+        voice: Optional[str] = None,
+        work_id: Optional[str] = None,
+        encode_limit: Optional[asyncio.Semaphore] = None
     ):
+        """
+        work_id prefixes temporary files so that concurrent jobs with the
+        same questions do not overwrite each other's slides and audio.
+        encode_limit bounds encoding shared by the jobs of one worker.
+        """
         self.renderer = renderer
         self.tts = TTSEngine(language, voice)
         self.language = language
+        self.work_id = work_id
+        self.encode_limit = encode_limit or nullcontext()
 
         self.clips: List[Any] = []
         self.temp_files: List[str] = []
+        # Audio path -> synthesis started by prefetch_audio
+        self._audio: Dict[str, asyncio.Task] = {}
+
+    def _file_id(self, question: Dict[str, Any], number: int) -> str:
+        question_id = question.get("id", str(number))
+        if self.work_id:
+            question_id = f"{self.work_id}_{question_id}"
+        return question_id
+
+    def _narration(self, question: Dict[str, Any], number: int) -> List[tuple]:
+        """(text, audio path) of the question and answer narration"""
+        file_id = self._file_id(question, number)
+        return [
+            (self.tts.format_question_text(question),
+             os.path.join(settings.AUDIO_OUTPUT_DIR, f"{file_id}_question.mp3")),
+            (self.tts.format_answer_text(question),
+             os.path.join(settings.AUDIO_OUTPUT_DIR, f"{file_id}_answer.mp3")),
+        ]
+
+    def prefetch_audio(self, questions: List[Dict[str, Any]]):
+        """
+        Start synthesizing the narration of all questions concurrently;
+        add_question then waits for its audio instead of synthesizing it.
+        Questions are numbered from 1 in list order, so add them with
+        number=1, 2, ... for their audio to be found.
+        Concurrency is bounded by the TTS engine's adaptive limiter.
+        """
+        for number, question in enumerate(questions, 1):
+            for text, path in self._narration(question, number):
+                if path not in self._audio:
+                    self._audio[path] = asyncio.create_task(self.tts.synthesize(text, path))
+
+    async def cancel_prefetch(self):
+        """Stop synthesizing narration that will not be used"""
+        tasks = list(self._audio.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Remove whatever the cancelled synthesis already wrote
+        self.temp_files.extend(self._audio)
+        self._audio = {}
+
+    async def _synthesize(self, text: str, path: str):
+        task = self._audio.pop(path, None)
+        if task is not None:
+            await task
+        else:
+            await self.tts.synthesize(text, path)
+        self.temp_files.append(path)
 
     async def add_question(
         self,
@@ -45,7 +104,22 @@ class VideoComposer:
         2. Question (with answer revealed)
         3. Explanation
         """
-        question_id = question.get("id", str(number))
+        try:
+            await self._add_question(question, number, include_explanation, pause_before_answer)
+        except BaseException:
+            # The video will not be finished: stop synthesizing the rest
+            await self.cancel_prefetch()
+            raise
+
+    async def _add_question(
+        self,
+        question: Dict[str, Any],
+        number: int,
+        include_explanation: bool,
+        pause_before_answer: float
+    ):
+        question_id = self._file_id(question, number)
+        (question_text, question_audio), (answer_text, answer_audio) = self._narration(question, number)
 
         # 1. Question slide (no answer)
         question_slide = os.path.join(
@@ -59,13 +133,7 @@ class VideoComposer:
         self.temp_files.append(question_slide)
 
         # Question audio
-        question_audio = os.path.join(
-            settings.AUDIO_OUTPUT_DIR,
-            f"{question_id}_question.mp3"
-        )
-        question_text = self.tts.format_question_text(question)
-        await self.tts.synthesize(question_text, question_audio)
-        self.temp_files.append(question_audio)
+        await self._synthesize(question_text, question_audio)
 
         # Create question clip
         audio_clip = AudioFileClip(question_audio)
@@ -87,13 +155,7 @@ class VideoComposer:
         self.temp_files.append(answer_slide)
 
         # Answer audio
-        answer_audio = os.path.join(
-            settings.AUDIO_OUTPUT_DIR,
-            f"{question_id}_answer.mp3"
-        )
-        answer_text = self.tts.format_answer_text(question)
-        await self.tts.synthesize(answer_text, answer_audio)
-        self.temp_files.append(answer_audio)
+        await self._synthesize(answer_text, answer_audio)
 
         # Create answer clip
         answer_audio_clip = AudioFileClip(answer_audio)
@@ -141,28 +203,43 @@ class VideoComposer:
 
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-        # Concatenate all clips
-        final = concatenate_videoclips(self.clips, method="compose")
-
-        # Write video file
-        final.write_videofile(
-            output_path,
-            fps=fps,
-            codec=codec,
-            audio_codec=audio_codec,
-            threads=4,
-            logger=None  # Suppress output
-        )
+        def encode():
+            # Concatenate all clips
+            final = concatenate_videoclips(self.clips, method="compose")
+
+            # Write video file
+            final.write_videofile(
+                output_path,
+                fps=fps,
+                codec=codec,
+                audio_codec=audio_codec,
+                threads=4,
+                logger=None  # Suppress output
+            )
 
-        # Cleanup
-        final.close()
-        for clip in self.clips:
-            clip.close()
+            # Cleanup
+            final.close()
+            for clip in self.clips:
+                clip.close()
+
+        # Encoding is CPU-bound; keep the event loop free meanwhile
+        async with self.encode_limit:
+            await asyncio.to_thread(encode)
 
         return output_path
 
     def cleanup(self):
         """Remove temporary files"""
+        # Narration prefetched for questions that were never added
+        for path, task in self._audio.items():
+            if task.done():
+                if not task.cancelled():
+                    task.exception()
+            else:
+                task.cancel()
+            self.temp_files.append(path)
+        self._audio = {}
+
         for filepath in self.temp_files:
             try:
                 if os.path.exists(filepath):
@@ -209,6 +286,7 @@ async def generate_exam_video(
 
     try:
         composer = VideoComposer(renderer, language)
+        composer.prefetch_audio(questions)
 
         for i, question in enumerate(questions, 1):
             await composer.add_question(
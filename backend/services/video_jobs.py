@@ -0,0 +1,349 @@
+"""
+Video Job Store - Persistent state of video generation jobs
+
+Jobs are shared by every API worker (and video worker) on the host, so
+/status answers the same whichever process serves it and jobs survive
+restarts. JobStore is the interface; SQLiteJobStore (WAL mode) is the
+default and other backends (e.g. Redis) plug in by implementing JobStore
+and handling their URL scheme in create_job_store().
+"""
+import asyncio
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import settings
+from metrics import metrics
+from models.schemas import VideoJob, VideoRequest, VideoStatus
+
+# Job fields that update() and transition() may set
+MUTABLE_FIELDS = ("progress", "message", "video_url")
+
+# Statuses after which a job no longer changes
+FINISHED_STATUSES = (VideoStatus.completed, VideoStatus.failed)
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat(timespec="microseconds")
+
+
+class JobStore:
+    """Video job storage interface"""
+
+    # File that the one API process starting this host's worker pool keeps locked
+    lock_path: Optional[str] = None
+
+    async def create(self, job: VideoJob, request: VideoRequest, max_pending: Optional[int] = None) -> bool:
+        """
+        Store a new job with the request needed to run it.
+        Returns False without storing it when max_pending jobs are already
+        waiting (the check and the insert are atomic).
+        """
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[VideoJob]:
+        raise NotImplementedError
+
+    async def get_request(self, job_id: str) -> Optional[VideoRequest]:
+        """The request a job was created with"""
+        raise NotImplementedError
+
+    async def update(self, job_id: str, **fields) -> bool:
+        """Set progress/message/video_url without changing the status"""
+        raise NotImplementedError
+
+    async def transition(
+        self,
+        job_id: str,
+        from_statuses: Iterable[VideoStatus],
+        to_status: VideoStatus,
+        **fields
+    ) -> bool:
+        """
+        Atomically move a job to to_status if its status is one of
+        from_statuses; returns False (and changes nothing) otherwise.
+        """
+        raise NotImplementedError
+
+    async def claim_next(self, worker_id: str) -> Optional[str]:
+        """Atomically move the oldest pending job to processing for worker_id"""
+        raise NotImplementedError
+
+    async def heartbeat(self, worker_id: str):
+        """Extend the lease on the jobs worker_id is processing"""
+        raise NotImplementedError
+
+    async def fail_stale(self, lease_seconds: float) -> int:
+        """Fail processing jobs whose worker has not sent a heartbeat in lease_seconds"""
+        raise NotImplementedError
+
+    async def queue_position(self, job_id: str) -> Optional[int]:
+        """1-based position of a pending job in the queue, None if not pending"""
+        raise NotImplementedError
+
+    async def average_duration(self, sample: int = 20) -> Optional[float]:
+        """Average processing time in seconds of the last completed jobs"""
+        raise NotImplementedError
+
+    async def delete(self, job_id: str) -> bool:
+        raise NotImplementedError
+
+    async def list(self, status: Optional[VideoStatus] = None, limit: int = 100) -> List[VideoJob]:
+        """Jobs, newest first, optionally with one status"""
+        raise NotImplementedError
+
+    async def count(self, status: VideoStatus) -> int:
+        raise NotImplementedError
+
+    async def close(self):
+        """Release connections"""
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Job store in a SQLite file shared by the processes on one host.
+
+    WAL mode lets readers run alongside the single writer; status
+    changes are conditional UPDATEs, so two processes can never both
+    move the same job. Calls run on one dedicated thread that owns the
+    connection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = f"{path}.workers.lock"
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="video-jobs")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS video_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    video_url TEXT,
+                    request TEXT NOT NULL,
+                    worker_id TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    heartbeat_at TEXT
+                );
+                CREATE INDEX IF NOT EXISTS ix_video_jobs_status_created
+                    ON video_jobs (status, created_at);
+                CREATE INDEX IF NOT EXISTS ix_video_jobs_created
+                    ON video_jobs (created_at);
+            """)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, name: str, fn, *args) -> Any:
+        """Run fn(conn, *args) on the store thread"""
+        def call():
+            with metrics.timer(f"video_jobs_{name}_seconds"):
+                return fn(self._connect(), *args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> VideoJob:
+        return VideoJob(
+            job_id=row["job_id"],
+            status=row["status"],
+            progress=row["progress"],
+            message=row["message"],
+            video_url=row["video_url"],
+            created_at=row["created_at"]
+        )
+
+    @staticmethod
+    def _assignments(fields: Dict[str, Any]) -> tuple:
+        unknown = set(fields) - set(MUTABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot set job fields: {', '.join(sorted(unknown))}")
+        columns = [f"{name} = ?" for name in fields] + ["updated_at = ?"]
+        return ", ".join(columns), [*fields.values(), _now()]
+
+    async def create(self, job: VideoJob, request: VideoRequest, max_pending: Optional[int] = None) -> bool:
+        values = (
+            job.job_id, job.status.value, job.progress, job.message, job.video_url,
+            request.model_dump_json(), job.created_at.isoformat(timespec="microseconds"), _now()
+        )
+
+        def insert(conn):
+            if max_pending is None:
+                return conn.execute(
+                    "INSERT INTO video_jobs (job_id, status, progress, message, video_url, request, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values
+                ).rowcount
+            return conn.execute(
+                "INSERT INTO video_jobs (job_id, status, progress, message, video_url, request, created_at, updated_at) "
+                "SELECT ?, ?, ?, ?, ?, ?, ?, ? "
+                "WHERE (SELECT COUNT(*) FROM video_jobs WHERE status = 'pending') < ?",
+                (*values, max_pending)
+            ).rowcount
+        return await self._run("create", insert) > 0
+
+    async def get(self, job_id: str) -> Optional[VideoJob]:
+        def select(conn):
+            return conn.execute("SELECT * FROM video_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        row = await self._run("get", select)
+        return self._to_job(row) if row else None
+
+    async def get_request(self, job_id: str) -> Optional[VideoRequest]:
+        def select(conn):
+            return conn.execute("SELECT request FROM video_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        row = await self._run("get_request", select)
+        return VideoRequest.model_validate(json.loads(row["request"])) if row else None
+
+    async def update(self, job_id: str, **fields) -> bool:
+        assignments, values = self._assignments(fields)
+
+        def execute(conn):
+            return conn.execute(
+                f"UPDATE video_jobs SET {assignments} WHERE job_id = ?", (*values, job_id)
+            ).rowcount
+        return await self._run("update", execute) > 0
+
+    async def transition(
+        self,
+        job_id: str,
+        from_statuses: Iterable[VideoStatus],
+        to_status: VideoStatus,
+        **fields
+    ) -> bool:
+        assignments, values = self._assignments(fields)
+        if to_status in FINISHED_STATUSES:
+            assignments += ", finished_at = ?"
+            values.append(_now())
+        statuses = [VideoStatus(s).value for s in from_statuses]
+        placeholders = ", ".join("?" for _ in statuses)
+
+        def execute(conn):
+            return conn.execute(
+                f"UPDATE video_jobs SET status = ?, {assignments} "
+                f"WHERE job_id = ? AND status IN ({placeholders})",
+                (to_status.value, *values, job_id, *statuses)
+            ).rowcount
+        moved = await self._run("transition", execute) > 0
+        if moved:
+            metrics.inc(f"video_jobs_{to_status.value}")
+        return moved
+
+    async def claim_next(self, worker_id: str) -> Optional[str]:
+        def execute(conn):
+            now = _now()
+            row = conn.execute(
+                "UPDATE video_jobs SET status = 'processing', worker_id = ?, message = 'Initializing...', "
+                "started_at = ?, heartbeat_at = ?, updated_at = ? "
+                "WHERE job_id = (SELECT job_id FROM video_jobs WHERE status = 'pending' "
+                "ORDER BY created_at LIMIT 1) AND status = 'pending' "
+                "RETURNING job_id",
+                (worker_id, now, now, now)
+            ).fetchone()
+            return row["job_id"] if row else None
+        job_id = await self._run("claim_next", execute)
+        if job_id:
+            metrics.inc("video_jobs_processing")
+        return job_id
+
+    async def heartbeat(self, worker_id: str):
+        def execute(conn):
+            conn.execute(
+                "UPDATE video_jobs SET heartbeat_at = ? WHERE worker_id = ? AND status = 'processing'",
+                (_now(), worker_id)
+            )
+        await self._run("heartbeat", execute)
+
+    async def fail_stale(self, lease_seconds: float) -> int:
+        def execute(conn):
+            cutoff = (datetime.utcnow() - timedelta(seconds=lease_seconds)).isoformat(timespec="microseconds")
+            now = _now()
+            return conn.execute(
+                "UPDATE video_jobs SET status = 'failed', message = 'Worker stopped responding', "
+                "finished_at = ?, updated_at = ? "
+                "WHERE status = 'processing' AND heartbeat_at < ?",
+                (now, now, cutoff)
+            ).rowcount
+        failed = await self._run("fail_stale", execute)
+        if failed:
+            metrics.inc("video_jobs_stale", failed)
+        return failed
+
+    async def queue_position(self, job_id: str) -> Optional[int]:
+        def select(conn):
+            return conn.execute(
+                "SELECT COUNT(*) FROM video_jobs AS queued JOIN video_jobs AS job "
+                "ON job.job_id = ? AND job.status = 'pending' "
+                "WHERE queued.status = 'pending' AND queued.created_at <= job.created_at",
+                (job_id,)
+            ).fetchone()[0]
+        position = await self._run("queue_position", select)
+        return position or None
+
+    async def average_duration(self, sample: int = 20) -> Optional[float]:
+        def select(conn):
+            return conn.execute(
+                "SELECT AVG((julianday(finished_at) - julianday(started_at)) * 86400) FROM ("
+                "SELECT started_at, finished_at FROM video_jobs WHERE status = 'completed' "
+                "AND started_at IS NOT NULL ORDER BY created_at DESC LIMIT ?)",
+                (sample,)
+            ).fetchone()[0]
+        return await self._run("average_duration", select)
+
+    async def delete(self, job_id: str) -> bool:
+        def execute(conn):
+            return conn.execute("DELETE FROM video_jobs WHERE job_id = ?", (job_id,)).rowcount
+        return await self._run("delete", execute) > 0
+
+    async def list(self, status: Optional[VideoStatus] = None, limit: int = 100) -> List[VideoJob]:
+        def select(conn):
+            if status is None:
+                return conn.execute(
+                    "SELECT * FROM video_jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+                ).fetchall()
+            return conn.execute(
+                "SELECT * FROM video_jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?",
+                (VideoStatus(status).value, limit)
+            ).fetchall()
+        return [self._to_job(row) for row in await self._run("list", select)]
+
+    async def count(self, status: VideoStatus) -> int:
+        def select(conn):
+            return conn.execute(
+                "SELECT COUNT(*) FROM video_jobs WHERE status = ?", (VideoStatus(status).value,)
+            ).fetchone()[0]
+        return await self._run("count", select)
+
+    async def close(self):
+        def close(conn):
+            conn.close()
+            self._conn = None
+        if self._conn is not None:
+            await self._run("close", close)
+        self._executor.shutdown(wait=False)
+
+
+def create_job_store(url: str = settings.VIDEO_JOB_STORE_URL) -> JobStore:
+    """Create the job store for a URL such as sqlite:///./output/video_jobs.db"""
+    scheme, sep, location = url.partition("://")
+    if scheme == "sqlite" and sep:
+        # sqlite:///relative/path or sqlite:////absolute/path
+        return SQLiteJobStore(location[1:] if location.startswith("/") else location)
+    raise ValueError(f"Unsupported VIDEO_JOB_STORE_URL: {url}")
+
+
+# Global job store instance
+job_store = create_job_store()
@@ -0,0 +1,273 @@
+"""
+Video Worker - Runs queued video jobs outside the API request path
+
+POST /api/video/generate only stores a pending job. Worker processes
+claim pending jobs from the job store, render slides, synthesize speech
+and encode the video. Each worker runs up to VIDEO_JOBS_PER_WORKER jobs
+with one shared browser and at most VIDEO_ENCODE_CONCURRENCY encodes at
+a time; speech calls are bounded by the TTS engine's adaptive limiter.
+
+Workers are started by the API (VIDEO_WORKERS) or run standalone with
+scripts/video_worker.py. When uvicorn runs several API processes, only
+the one holding the job store's lock file starts VIDEO_WORKERS workers,
+so the host runs one pool whatever the number of API processes.
+"""
+import asyncio
+import math
+import multiprocessing
+import os
+import signal
+import socket
+import uuid
+from typing import IO, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock, every API process starts workers
+    fcntl = None
+
+from config import settings
+from metrics import metrics
+from models.schemas import VideoStatus
+from .video_jobs import JobStore, job_store
+
+# Lock file held by this process while it owns the host's worker pool
+_pool_lock: Optional[IO] = None
+
+
+async def estimate_wait(position: int, store: JobStore = job_store) -> int:
+    """
+    Seconds until the job at a queue position starts, from the average
+    duration of recent jobs and the number of jobs running now.
+    """
+    average = await store.average_duration() or settings.VIDEO_JOB_ESTIMATE_SECONDS
+    running = max(await store.count(VideoStatus.processing), 1)
+    return math.ceil(position * average / running)
+
+
+class VideoWorker:
+    """Claims and runs video jobs in one process"""
+
+    def __init__(
+        self,
+        store: JobStore = job_store,
+        jobs: int = settings.VIDEO_JOBS_PER_WORKER,
+        encode_concurrency: int = settings.VIDEO_ENCODE_CONCURRENCY,
+        poll_interval: float = settings.VIDEO_WORKER_POLL_SECONDS,
+        lease_seconds: float = settings.VIDEO_JOB_LEASE_SECONDS
+    ):
+        self.store = store
+        self.jobs = jobs
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.encode_limit = asyncio.Semaphore(encode_concurrency)
+        self.renderer = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    def stop(self):
+        """Stop claiming jobs; running jobs are requeued"""
+        self._stopping = True
+        self._wakeup.set()
+
+    async def run(self):
+        """Claim and run jobs until stop() is called"""
+        from .slide_renderer import SlideRenderer
+        self.renderer = SlideRenderer()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            while not self._stopping:
+                while len(self._running) < self.jobs:
+                    job_id = await self.store.claim_next(self.worker_id)
+                    if job_id is None:
+                        break
+                    task = asyncio.create_task(self.run_job(job_id))
+                    task.add_done_callback(lambda _, job_id=job_id: self._finished(job_id))
+                    self._running[job_id] = task
+                metrics.set_gauge("video_worker_running_jobs", len(self._running))
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        finally:
+            heartbeat.cancel()
+            for task in self._running.values():
+                task.cancel()
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+            if self.renderer.browser:
+                await self.renderer.close_browser()
+
+    def _finished(self, job_id: str):
+        self._running.pop(job_id, None)
+        self._wakeup.set()
+
+    async def _heartbeat(self):
+        """Keep the leases on this worker's jobs and fail jobs of dead workers"""
+        while True:
+            try:
+                await self.store.heartbeat(self.worker_id)
+                stale = await self.store.fail_stale(self.lease_seconds)
+                if stale:
+                    print(f"Failed {stale} video jobs of unresponsive workers")
+            except Exception as e:
+                print(f"Video worker heartbeat failed: {e}")
+            await asyncio.sleep(self.lease_seconds / 4)
+
+    async def run_job(self, job_id: str):
+        """Generate the video of a claimed job"""
+        from .video_composer import VideoComposer
+        from .exam_catalog import catalog
+
+        composer = None
+        try:
+            request = await self.store.get_request(job_id)
+            if request is None:
+                return
+
+            # Get question data
+            record = await catalog.fetch_record(request.exam_id)
+            if record is None:
+                raise Exception(f"Exam not found: {request.exam_id}")
+
+            # Filter requested questions
+            selected_questions = [
+                q for q in record.questions
+                if q["id"] in request.question_ids
+            ]
+
+            if not selected_questions:
+                raise Exception("No questions found")
+
+            composer = VideoComposer(
+                renderer=self.renderer,
+                language=request.language,
+                voice=request.voice,
+                work_id=job_id,
+                encode_limit=self.encode_limit
+            )
+
+            # Synthesize all narration concurrently while slides render
+            composer.prefetch_audio(selected_questions)
+
+            total = len(selected_questions)
+            for i, question in enumerate(selected_questions):
+                await self.store.update(
+                    job_id,
+                    progress=(i / total) * 100,
+                    message=f"Processing question {i + 1}/{total}"
+                )
+                await composer.add_question(
+                    question,
+                    number=i + 1,
+                    include_explanation=request.include_explanation
+                )
+
+            await self.store.update(job_id, message="Composing final video...")
+            output_path = os.path.join(settings.VIDEO_OUTPUT_DIR, f"{job_id}.mp4")
+            with metrics.timer("video_encode_seconds"):
+                await composer.compose(output_path)
+
+            await self.store.transition(
+                job_id, [VideoStatus.processing], VideoStatus.completed,
+                progress=100,
+                video_url=f"/api/video/download/{job_id}",
+                message="Video ready!"
+            )
+
+        except asyncio.CancelledError:
+            # Worker is stopping: let another worker start the job over
+            await self.store.transition(
+                job_id, [VideoStatus.processing], VideoStatus.pending,
+                progress=0, message="Job queued"
+            )
+            raise
+        except Exception as e:
+            await self.store.transition(
+                job_id, [VideoStatus.processing], VideoStatus.failed, message=str(e)
+            )
+        finally:
+            if composer:
+                composer.cleanup()
+
+
+async def serve(jobs: int = settings.VIDEO_JOBS_PER_WORKER):
+    """Run a worker in this process until SIGTERM or SIGINT"""
+    from .exam_catalog import catalog
+
+    worker = VideoWorker(jobs=jobs)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+
+    # Jobs look questions up in the exam catalog
+    await asyncio.to_thread(catalog.build)
+    catalog_watcher = None
+    if settings.EXAM_CATALOG_POLL_SECONDS > 0:
+        catalog_watcher = asyncio.create_task(catalog.watch(settings.EXAM_CATALOG_POLL_SECONDS))
+
+    print(f"Video worker {worker.worker_id} running up to {jobs} jobs")
+    try:
+        await worker.run()
+    finally:
+        if catalog_watcher:
+            catalog_watcher.cancel()
+        await worker.store.close()
+
+
+def run_worker_process(jobs: int):
+    """Entry point of a worker process"""
+    asyncio.run(serve(jobs))
+
+
+def claim_worker_pool(store: JobStore = job_store) -> bool:
+    """
+    Take the host-wide lock on starting worker processes. Returns False
+    when another process holds it. The lock is released when this
+    process exits, and the next API process to start takes it over.
+    """
+    global _pool_lock
+    if _pool_lock is not None or fcntl is None or store.lock_path is None:
+        return True
+
+    directory = os.path.dirname(store.lock_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    lock_file = open(store.lock_path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _pool_lock = lock_file
+    return True
+
+
+def start_worker_processes(
+    count: int = settings.VIDEO_WORKERS,
+    jobs: int = settings.VIDEO_JOBS_PER_WORKER
+) -> List[multiprocessing.Process]:
+    """Start count worker processes"""
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for i in range(count):
+        process = context.Process(
+            target=run_worker_process, args=(jobs,), name=f"video-worker-{i}", daemon=True
+        )
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def stop_worker_processes(processes: List[multiprocessing.Process], timeout: Optional[float] = 30):
+    """Ask workers to stop (requeueing their jobs), then kill stragglers"""
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(timeout)
+        if process.is_alive():
+            process.kill()
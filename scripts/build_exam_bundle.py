@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Pack the sample-data exam files into one indexed binary bundle for the backend
+
+The backend memory-maps the bundle (EXAM_BUNDLE_PATH) instead of parsing
+every JSON file at startup; see backend/services/exam_bundle.py.
+
+Layout (little-endian):
+    header     magic "SFEB", version, flags, exam count, question count and
+               the offsets of the three sections below
+    strings    u32 count, count x (u32 offset, u32 length), UTF-8 data
+    exams      per file: filename, header JSON (or parse error), flags,
+               first question, question count, span of the questions array
+               body, source mtime/size, file span
+    questions  per question: id, domain, offset and length of its JSON text
+    files      each exam file's original bytes, served for whole-exam requests;
+               all spans above point into this section, so every exam is
+               stored once
+
+Exam files are collected recursively; files in subdirectories are stored
+under their "/"-separated path relative to data_dir, which the backend
+uses as the exam's namespace.
+
+Usage:
+    python build_exam_bundle.py [data_dir] [output_path]
+"""
+
+import json
+import os
+import re
+import struct
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DATA_DIR = BASE_DIR / 'web' / 'public' / 'sample-data'
+
+# Share the bundle layout and header parsing with the backend; services.exam_format
+# only needs the standard library
+sys.path.insert(0, str(BASE_DIR / 'backend'))
+
+from services.exam_format import (
+    MAGIC, VERSION, HEADER, STRING_ENTRY, EXAM_ENTRY, QUESTION_ENTRY, EXAM_QUARANTINED,
+    exam_header
+)
+
+DEFAULT_OUTPUT = DEFAULT_DATA_DIR.parent / 'exams.bundle'
+
+
+class StringTable:
+    """Deduplicated UTF-8 string table"""
+
+    def __init__(self):
+        self.index = {}
+        self.strings = []
+
+    def add(self, value: str) -> int:
+        if value not in self.index:
+            self.index[value] = len(self.strings)
+            self.strings.append(value.encode('utf-8'))
+        return self.index[value]
+
+    def encode(self) -> bytes:
+        entries = bytearray(struct.pack('<I', len(self.strings)))
+        data = bytearray()
+        for s in self.strings:
+            entries += STRING_ENTRY.pack(len(data), len(s))
+            data += s
+        return bytes(entries + data)
+
+
+def dump(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def question_spans(raw: bytes):
+    """
+    Find each question's JSON text in an exam file.
+
+    Returns (questions, body_start, body_end): a list of (question, start, end)
+    and the span of the questions array body, as byte offsets into raw.
+    Only called on files that json.loads already accepted.
+    """
+    text = raw.decode('utf-8')
+    decoder = json.JSONDecoder()
+    chars = byte = 0
+
+    def to_byte(i: int) -> int:
+        # Offsets are requested in increasing order, so encode each stretch once
+        nonlocal chars, byte
+        byte += len(text[chars:i].encode('utf-8'))
+        chars = i
+        return byte
+
+    def skip(i: int) -> int:
+        return WHITESPACE.match(text, i).end()
+
+    found = ([], 0, 0)
+    pos = skip(1 if text.startswith('\ufeff') else 0)
+    if text[pos] != '{':
+        return found
+    pos = skip(pos + 1)
+    while text[pos] != '}':
+        key, pos = json.decoder.scanstring(text, pos + 1)
+        pos = skip(skip(pos) + 1)  # ':'
+        if key == 'questions' and text[pos] == '[':
+            pos = skip(pos + 1)
+            questions = []
+            body_start = body_end = to_byte(pos)
+            while text[pos] != ']':
+                question, end = decoder.raw_decode(text, pos)
+                start = to_byte(pos)
+                body_end = to_byte(end)
+                questions.append((question, start, body_end))
+                pos = skip(end)
+                if text[pos] == ',':
+                    pos = skip(pos + 1)
+            found = (questions, body_start, body_end)
+            pos += 1
+        else:
+            pos = decoder.raw_decode(text, pos)[1]
+        pos = skip(pos)
+        if text[pos] == ',':
+            pos = skip(pos + 1)
+    return found
+
+
+def build_bundle(data_dir: Path, output_path: Path) -> dict:
+    """Pack every exam JSON file under data_dir into output_path"""
+    strings = StringTable()
+    exams = bytearray()
+    questions = bytearray()
+    files = bytearray()
+    stats = {'exams': 0, 'questions': 0, 'quarantined': 0}
+
+    for path in sorted(data_dir.rglob('*.json')):
+        name = path.relative_to(data_dir).as_posix()
+        if any(part.startswith('.') for part in path.relative_to(data_dir).parts):
+            continue
+        st = path.stat()
+        filename_idx = strings.add(name)
+
+        raw = path.read_bytes()
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            print(f"Quarantined {name}: {e}")
+            exams += EXAM_ENTRY.pack(
+                filename_idx, strings.add(str(e)), EXAM_QUARANTINED,
+                0, 0, 0, 0, st.st_mtime_ns, st.st_size, 0, 0
+            )
+            stats['quarantined'] += 1
+            continue
+
+        exam = exam_header(name, data)
+        if not exam:
+            continue
+
+        first_question = stats['questions']
+        file_start = len(files)
+        spans, body_start, body_end = question_spans(raw)
+        for question, start, end in spans:
+            questions += QUESTION_ENTRY.pack(
+                strings.add(str(question.get('id'))),
+                strings.add(str(question.get('domain'))),
+                file_start + start, end - start
+            )
+            stats['questions'] += 1
+
+        files += raw
+        exams += EXAM_ENTRY.pack(
+            filename_idx, strings.add(dump(exam).decode('utf-8')), 0,
+            first_question, stats['questions'] - first_question,
+            file_start + body_start, file_start + body_end,
+            st.st_mtime_ns, st.st_size, file_start, len(files)
+        )
+        stats['exams'] += 1
+
+    string_data = strings.encode()
+    strings_offset = HEADER.size
+    exams_offset = strings_offset + len(string_data)
+    questions_offset = exams_offset + len(exams)
+    files_offset = questions_offset + len(questions)
+    exam_count = len(exams) // EXAM_ENTRY.size
+
+    # Write to a temp file and rename so running servers never map a partial bundle
+    tmp_path = output_path.with_suffix(output_path.suffix + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(
+            MAGIC, VERSION, 0, exam_count, stats['questions'],
+            strings_offset, exams_offset, questions_offset, files_offset
+        ))
+        f.write(string_data)
+        f.write(exams)
+        f.write(questions)
+        f.write(files)
+    os.replace(tmp_path, output_path)
+    return stats
+
+
+def main():
+    data_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DATA_DIR
+    output_path = Path(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_OUTPUT
+
+    stats = build_bundle(data_dir, output_path)
+    size_mb = output_path.stat().st_size / 1024 / 1024
+    print(f"Created {output_path} ({size_mb:.1f} MB): "
+          f"{stats['exams']} exams, {stats['questions']} questions, "
+          f"{stats['quarantined']} quarantined files")
+
+
+if __name__ == '__main__':
+    main()